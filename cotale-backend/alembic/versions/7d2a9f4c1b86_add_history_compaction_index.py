@@ -0,0 +1,35 @@
+"""Add index for history compaction candidates
+
+Revision ID: 7d2a9f4c1b86
+Revises: e3f58a1b0c27
+Create Date: 2026-10-17 21:14:09.530871
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "7d2a9f4c1b86"
+down_revision: Union[str, None] = "e3f58a1b0c27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_document_history_operation_type_document_id",
+        "document_history",
+        ["operation_type", "document_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_document_history_operation_type_document_id",
+        table_name="document_history",
+    )
@@ -0,0 +1,40 @@
+"""Set documents.updated_at on insert
+
+Revision ID: 9c41d7e2a6f8
+Revises: 5b2e7c4a9d13
+Create Date: 2026-10-17 15:40:08.552913
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9c41d7e2a6f8"
+down_revision: Union[str, None] = "5b2e7c4a9d13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination orders by (updated_at, id), which must not be NULL
+    op.execute("UPDATE documents SET updated_at = created_at WHERE updated_at IS NULL")
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.alter_column(
+            "updated_at",
+            existing_type=sa.DateTime(timezone=True),
+            server_default=sa.text("(CURRENT_TIMESTAMP)"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("documents") as batch_op:
+        batch_op.alter_column(
+            "updated_at",
+            existing_type=sa.DateTime(timezone=True),
+            server_default=None,
+        )
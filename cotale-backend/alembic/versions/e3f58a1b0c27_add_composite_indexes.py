@@ -0,0 +1,77 @@
+"""Add composite indexes for hot queries
+
+Revision ID: e3f58a1b0c27
+Revises: 9c41d7e2a6f8
+Create Date: 2026-10-17 17:05:44.120385
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e3f58a1b0c27"
+down_revision: Union[str, None] = "9c41d7e2a6f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_documents_owner_id_updated_at",
+        "documents",
+        ["owner_id", "updated_at", "id"],
+        unique=False,
+    )
+
+    # Keep the oldest row of duplicated collaborator pairs before adding the
+    # unique constraint
+    op.execute(
+        "DELETE FROM document_collaborators WHERE id NOT IN "
+        "(SELECT MIN(id) FROM document_collaborators GROUP BY document_id, user_id)"
+    )
+    with op.batch_alter_table("document_collaborators") as batch_op:
+        batch_op.create_unique_constraint(
+            "uq_document_collaborators_document_id_user_id",
+            ["document_id", "user_id"],
+        )
+    op.create_index(
+        "ix_document_collaborators_user_id",
+        "document_collaborators",
+        ["user_id"],
+        unique=False,
+    )
+
+    op.create_index(
+        "ix_document_history_document_id_created_at",
+        "document_history",
+        ["document_id", "created_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_document_history_document_id_operation_type_id",
+        "document_history",
+        ["document_id", "operation_type", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_document_history_document_id_operation_type_id",
+        table_name="document_history",
+    )
+    op.drop_index(
+        "ix_document_history_document_id_created_at", table_name="document_history"
+    )
+    op.drop_index(
+        "ix_document_collaborators_user_id", table_name="document_collaborators"
+    )
+    with op.batch_alter_table("document_collaborators") as batch_op:
+        batch_op.drop_constraint(
+            "uq_document_collaborators_document_id_user_id", type_="unique"
+        )
+    op.drop_index("ix_documents_owner_id_updated_at", table_name="documents")
@@ -6,8 +6,10 @@ from typing import Optional
 from sqlalchemy.orm import Session
 from fastapi import Depends
 
+from app.core.config import settings
 from app.db.database import get_db
 from app.services.auth_service import AuthService
+from app.services.backplane import create_backplane
 from app.services.websocket_service import WebSocketService
 from app.services.ai_service import AIService
 
@@ -24,7 +26,11 @@ def get_websocket_service() -> WebSocketService:
     """Get WebSocket service (singleton)"""
     global _websocket_service_instance
     if _websocket_service_instance is None:
-        _websocket_service_instance = WebSocketService()
+        _websocket_service_instance = WebSocketService(
+            backplane=create_backplane(
+                settings.WS_BACKPLANE_URL, settings.WS_BACKPLANE_QUEUE_SIZE
+            )
+        )
     return _websocket_service_instance
 
 
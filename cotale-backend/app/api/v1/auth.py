@@ -2,13 +2,20 @@
 Authentication API endpoints
 """
 
+from typing import Optional
 from fastapi import APIRouter, Depends
 from fastapi.security import HTTPBearer
 
 from app.api.deps import get_auth_service
 from app.services.auth_service import AuthService
-from app.schemas.user import UserCreate, UserLogin, User as UserSchema, Token
-from app.core.security import get_current_active_user
+from app.schemas.user import (
+    UserCreate,
+    UserLogin,
+    User as UserSchema,
+    Token,
+    TokenRefresh,
+)
+from app.core.security import get_current_active_user_async
 from app.models.user import User
 
 router = APIRouter()
@@ -20,7 +27,7 @@ async def register(
     user_data: UserCreate, auth_service: AuthService = Depends(get_auth_service)
 ):
     """Register a new user"""
-    return auth_service.register_user(user_data)
+    return await auth_service.register_user(user_data)
 
 
 @router.post("/login", response_model=Token)
@@ -28,16 +35,31 @@ async def login(
     user_credentials: UserLogin, auth_service: AuthService = Depends(get_auth_service)
 ):
     """Login user and return access token"""
-    return auth_service.login_user(user_credentials)
+    return await auth_service.login_user(user_credentials)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    token_data: TokenRefresh, auth_service: AuthService = Depends(get_auth_service)
+):
+    """Exchange a refresh token for new tokens, without a password check"""
+    return auth_service.refresh_tokens(token_data.refresh_token)
 
 
 @router.get("/me", response_model=UserSchema)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(
+    current_user: User = Depends(get_current_active_user_async),
+):
     """Get current user information"""
     return current_user
 
 
 @router.post("/logout")
-async def logout():
+async def logout(
+    token_data: Optional[TokenRefresh] = None,
+    auth_service: AuthService = Depends(get_auth_service),
+):
     """Logout user (client should remove token)"""
+    if token_data is not None:
+        auth_service.revoke_refresh_token(token_data.refresh_token)
     return {"message": "Successfully logged out"}
@@ -2,24 +2,32 @@
 Document API endpoints
 """
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db
-from app.core.security import get_current_active_user
+from app.db.database import get_async_db, get_db
+from app.core.security import get_current_active_user, get_current_active_user_async
 from app.models.user import User
+from app.services.async_document_service import AsyncDocumentService
 from app.services.document_service import DocumentService
 from app.schemas.document import (
     Document,
     DocumentCreate,
     DocumentUpdate,
     DocumentSummary,
-    DocumentCollaborator,
 )
 
 router = APIRouter()
 
+# Page sizes of the document listings
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 @router.post("/", response_model=Document)
 async def create_document(
@@ -34,65 +42,49 @@ async def create_document(
 
 @router.get("/", response_model=List[DocumentSummary])
 async def get_user_documents(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get all documents owned by current user"""
-    document_service = DocumentService(db)
-    documents = document_service.get_user_documents(current_user)
-
-    # Convert to summary format
-    summaries = []
-    for doc in documents:
-        summary = DocumentSummary(
-            id=str(doc.id),
-            title=str(doc.title),
-            owner_id=int(doc.owner_id),
-            is_public=bool(doc.is_public),
-            created_at=doc.created_at,
-            updated_at=doc.updated_at,
-            collaborator_count=len(doc.collaborators) if doc.collaborators else 0,
-        )
-        summaries.append(summary)
-
+    """Get documents owned by current user, newest first, one page at a time"""
+    document_service = AsyncDocumentService(db)
+    summaries, next_cursor = await document_service.get_user_document_summaries(
+        current_user, limit, cursor
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return summaries
 
 
 @router.get("/collaborations", response_model=List[DocumentSummary])
 async def get_user_collaborations(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get all documents user collaborates on"""
-    document_service = DocumentService(db)
-    documents = document_service.get_user_collaborations(current_user)
-
-    # Convert to summary format
-    summaries = []
-    for doc in documents:
-        summary = DocumentSummary(
-            id=str(doc.id),
-            title=str(doc.title),
-            owner_id=int(doc.owner_id),
-            is_public=bool(doc.is_public),
-            created_at=doc.created_at,
-            updated_at=doc.updated_at,
-            collaborator_count=len(doc.collaborators) if doc.collaborators else 0,
-        )
-        summaries.append(summary)
-
+    """Get documents user collaborates on, newest first, one page at a time"""
+    document_service = AsyncDocumentService(db)
+    summaries, next_cursor = await document_service.get_user_collaboration_summaries(
+        current_user, limit, cursor
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return summaries
 
 
 @router.get("/{document_id}", response_model=Document)
 async def get_document(
     document_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get a specific document"""
-    document_service = DocumentService(db)
-    document = document_service.get_document(document_id, current_user)
+    document_service = AsyncDocumentService(db)
+    document = await document_service.get_document(document_id, current_user)
 
     if not document:
         raise HTTPException(
@@ -171,12 +163,12 @@ async def remove_collaborator(
 @router.get("/{document_id}/permission")
 async def check_document_permission(
     document_id: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user_async),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Check user's permission for a document"""
-    document_service = DocumentService(db)
-    permission = document_service.check_user_permission(document_id, current_user)
+    document_service = AsyncDocumentService(db)
+    permission = await document_service.check_user_permission(document_id, current_user)
 
     return {
         "document_id": document_id,
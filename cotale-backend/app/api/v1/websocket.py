@@ -9,19 +9,19 @@ from fastapi import (
     WebSocketDisconnect,
     Depends,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
 
-from app.api.deps import get_websocket_service, get_ai_service, get_db
+from app.api.deps import get_websocket_service, get_ai_service
 from app.services.websocket_service import WebSocketService
 from app.services.ai_service import AIService
 from app.core.config import settings
-from app.db.repositories.user_repository import UserRepository
+from app.db.repositories.async_user_repository import AsyncUserRepository
 
 router = APIRouter()
 
 
-async def get_user_from_token(websocket: WebSocket, db: Session) -> tuple:
+async def get_user_from_token(websocket: WebSocket, db: AsyncSession) -> tuple:
     """Get user from WebSocket token"""
     token = websocket.query_params.get("token")
     if not token:
@@ -37,8 +37,8 @@ async def get_user_from_token(websocket: WebSocket, db: Session) -> tuple:
             await websocket.close(code=4001, reason="Invalid token")
             return None, None
 
-        user_repo = UserRepository(db)
-        user = user_repo.get_by_email(user_email)
+        user_repo = AsyncUserRepository(db)
+        user = await user_repo.get_by_email(user_email)
         if not user:
             await websocket.close(code=4001, reason="User not found")
             return None, None
@@ -55,28 +55,47 @@ async def websocket_endpoint(
     document_id: str,
     websocket_service: WebSocketService = Depends(get_websocket_service),
     ai_service: AIService = Depends(get_ai_service),
-    db: Session = Depends(get_db),
 ):
     """WebSocket endpoint for real-time collaboration"""
-    # Authenticate user
-    user, user_id = await get_user_from_token(websocket, db)
+    # Authenticate user on a session released before the socket is served
+    async with websocket_service.async_session_factory() as db:
+        user, user_id = await get_user_from_token(websocket, db)
     if not user:
         return
 
     # Connect to document with permission check
-    connected = await websocket_service.connect(websocket, document_id, user, db)
+    connected = await websocket_service.connect(websocket, document_id, user)
     if not connected:
         return
 
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            websocket_service.touch(websocket)
+
+            # Binary frames carry raw Y.js updates, text frames carry JSON
+            if frame.get("bytes") is not None:
+                await websocket_service.handle_binary_frame(
+                    websocket, document_id, user_id, frame["bytes"]
+                )
+                continue
+
+            try:
+                message = json.loads(frame["text"])
+            except json.JSONDecodeError:
+                websocket_service.send_personal_message(
+                    websocket,
+                    document_id,
+                    {"type": "error", "message": "Invalid JSON format"},
+                )
+                continue
             message_type = message.get("type")
 
             if message_type == "yjs_update":
                 await websocket_service.handle_yjs_update(
-                    websocket, document_id, user_id, message, db
+                    websocket, document_id, user_id, message
                 )
             elif message_type == "cursor_update":
                 await websocket_service.handle_cursor_update(
@@ -85,7 +104,7 @@ async def websocket_endpoint(
             elif message_type == "content_change":
                 content = message.get("content", "")
                 await websocket_service.handle_content_change(
-                    websocket, document_id, user_id, content, db
+                    websocket, document_id, user_id, content
                 )
             elif message_type == "ai_request":
                 await ai_service.handle_ai_request(
@@ -93,27 +112,31 @@ async def websocket_endpoint(
                 )
             elif message_type == "ping":
                 # Handle ping for connection keep-alive
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                websocket_service.send_personal_message(
+                    websocket, document_id, {"type": "pong"}
+                )
+            elif message_type == "pong":
+                # Reply to a server heartbeat; receiving it is enough
+                pass
             else:
-                await websocket.send_text(
-                    json.dumps(
-                        {
-                            "type": "error",
-                            "message": f"Unknown message type: {message_type}",
-                        }
-                    )
+                websocket_service.send_personal_message(
+                    websocket,
+                    document_id,
+                    {
+                        "type": "error",
+                        "message": f"Unknown message type: {message_type}",
+                    },
                 )
 
     except WebSocketDisconnect:
-        websocket_service.disconnect(websocket, document_id, user_id)
-    except json.JSONDecodeError:
-        await websocket.send_text(
-            json.dumps({"type": "error", "message": "Invalid JSON format"})
-        )
+        pass
     except Exception as e:
-        await websocket.send_text(
-            json.dumps({"type": "error", "message": f"Server error: {str(e)}"})
+        await websocket_service.send_final_message(
+            websocket,
+            document_id,
+            {"type": "error", "message": f"Server error: {str(e)}"},
         )
+    finally:
         websocket_service.disconnect(websocket, document_id, user_id)
 
 
@@ -42,10 +42,46 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(
         os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
     )
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    AUTH_HASH_WORKERS: int = int(os.getenv("AUTH_HASH_WORKERS", "4"))
+    AUTH_HASH_MAX_PENDING: int = int(os.getenv("AUTH_HASH_MAX_PENDING", "64"))
+    PERMISSION_CACHE_TTL_SECONDS: int = int(
+        os.getenv("PERMISSION_CACHE_TTL_SECONDS", "300")
+    )
+    PERMISSION_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("PERMISSION_CACHE_MAX_ENTRIES", "10000")
+    )
 
     # WebSocket Configuration
     WS_MAX_CONNECTIONS: int = int(os.getenv("WS_MAX_CONNECTIONS", "100"))
+    WS_MAX_ROOM_CONNECTIONS: int = int(os.getenv("WS_MAX_ROOM_CONNECTIONS", "20"))
+    WS_MAX_ROOM_SPECTATORS: int = int(os.getenv("WS_MAX_ROOM_SPECTATORS", "50"))
+    WS_RETRY_AFTER_SECONDS: int = int(os.getenv("WS_RETRY_AFTER_SECONDS", "5"))
     WS_HEARTBEAT_INTERVAL: int = int(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
+    WS_HEARTBEAT_MAX_MISSED: int = int(os.getenv("WS_HEARTBEAT_MAX_MISSED", "2"))
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+    WS_SEND_BUFFER_BYTES: int = int(os.getenv("WS_SEND_BUFFER_BYTES", "1048576"))
+    WS_SEND_HIGH_WATER_BYTES: int = int(os.getenv("WS_SEND_HIGH_WATER_BYTES", "262144"))
+    WS_SLOW_CONSUMER_POLICY: str = os.getenv("WS_SLOW_CONSUMER_POLICY", "coalesce")
+    WS_CURSOR_TICK_MS: int = int(os.getenv("WS_CURSOR_TICK_MS", "40"))
+    WS_BACKPLANE_URL: str = os.getenv("WS_BACKPLANE_URL", "memory://")
+    WS_BACKPLANE_QUEUE_SIZE: int = int(os.getenv("WS_BACKPLANE_QUEUE_SIZE", "10000"))
+    WS_PERSIST_INTERVAL_MS: int = int(os.getenv("WS_PERSIST_INTERVAL_MS", "1000"))
+    WS_PERSIST_MAX_PENDING: int = int(os.getenv("WS_PERSIST_MAX_PENDING", "200"))
+
+    # History Compaction Configuration
+    HISTORY_COMPACTION_INTERVAL: int = int(
+        os.getenv("HISTORY_COMPACTION_INTERVAL", "300")
+    )
+    HISTORY_COMPACTION_MIN_UPDATES: int = int(
+        os.getenv("HISTORY_COMPACTION_MIN_UPDATES", "500")
+    )
+    # At least one checkpoint is kept: it holds the compacted Y.js updates
+    HISTORY_KEEP_CHECKPOINTS: int = max(
+        1, int(os.getenv("HISTORY_KEEP_CHECKPOINTS", "5"))
+    )
 
     # Logging Configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -0,0 +1,49 @@
+"""
+Bounded worker pool for password hashing
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+from fastapi import HTTPException, status
+
+T = TypeVar("T")
+
+
+class HashingPool:
+    """Runs bcrypt off the event loop on a fixed number of threads.
+
+    bcrypt releases the GIL, so threads hash in parallel. At most
+    max_pending calls may be running or queued; further calls are rejected
+    with 503 instead of piling up behind the pool.
+    """
+
+    def __init__(
+        self, max_workers: int, max_pending: int, retry_after: int = 1
+    ) -> None:
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.pending = 0  # calls running or waiting for a worker
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hash"
+        )
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Run a hashing function in the pool, shedding load when it is full"""
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,32 @@
+"""
+Opaque cursors for keyset pagination
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException, status
+
+# Position of a row in a listing ordered by (updated_at, id)
+Cursor = Tuple[datetime, str]
+
+
+def encode_cursor(updated_at: datetime, document_id: str) -> str:
+    """Encode the position of the last row of a page"""
+    raw = json.dumps([updated_at.isoformat(), document_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Decode a cursor from a previous page"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        updated_at, document_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(updated_at), str(document_id)
+    except (binascii.Error, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
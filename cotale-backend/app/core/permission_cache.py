@@ -0,0 +1,109 @@
+"""
+In-process cache of document permissions
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+# Called with (document_id, user_id) after a permission changed; user_id is
+# None when the change affects every user of the document
+PermissionListener = Callable[[str, Optional[int]], None]
+
+
+class PermissionCache:
+    """Effective permissions keyed by (document_id, user_id), evicted LRU.
+
+    Only granted permissions are cached, so a denial is always rechecked.
+    Entries live for at most ttl_seconds, which bounds how long a change
+    made by another process without a backplane can go unnoticed.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = (
+            OrderedDict()
+        )  # (document_id, user_id) -> (permission, expiry timestamp)
+        self._by_document: Dict[str, Set[int]] = {}  # document_id -> user_ids
+        self._listeners: List[PermissionListener] = []
+        self._lock = threading.Lock()
+
+    def get(self, document_id: str, user_id: int) -> Optional[str]:
+        """Get the cached permission of a user, if any"""
+        key = (document_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, document_id: str, user_id: int, permission: Optional[str]) -> None:
+        """Cache a granted permission"""
+        if permission is None or self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        key = (document_id, user_id)
+        with self._lock:
+            self._entries[key] = (permission, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self._by_document.setdefault(document_id, set()).add(user_id)
+            # Evict the least recently used entries when full
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, document_id: str, user_id: Optional[int] = None) -> None:
+        """Drop cached permissions of a document and notify listeners"""
+        self.discard(document_id, user_id)
+        for listener in list(self._listeners):
+            listener(document_id, user_id)
+
+    def discard(self, document_id: str, user_id: Optional[int] = None) -> None:
+        """Drop cached permissions without notifying listeners"""
+        with self._lock:
+            if user_id is not None:
+                self._discard((document_id, user_id))
+                return
+            for cached_user_id in list(self._by_document.get(document_id, ())):
+                self._discard((document_id, cached_user_id))
+
+    def add_listener(self, listener: PermissionListener) -> None:
+        """Call listener whenever a permission is invalidated"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: PermissionListener) -> None:
+        """Stop calling a listener"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._by_document.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit and miss counters and the number of entries"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+    def _discard(self, key: Tuple[str, int]) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        document_id, user_id = key
+        user_ids = self._by_document.get(document_id)
+        if user_ids is not None:
+            user_ids.discard(user_id)
+            if not user_ids:
+                del self._by_document[document_id]
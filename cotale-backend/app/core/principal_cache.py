@@ -0,0 +1,96 @@
+"""
+In-process cache of authenticated users
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from app.models.user import User
+
+
+class PrincipalCache:
+    """Users resolved from access tokens, keyed by a digest of the token.
+
+    An entry lives for at most ttl_seconds and never past the token's own
+    expiry. Cached users are detached from any session; entries of a user
+    are dropped when the user is updated or deleted in this process.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[bytes, Tuple[User, float]] = (
+            {}
+        )  # token digest -> (user, expiry timestamp)
+        self._by_user: Dict[int, Set[bytes]] = {}  # user_id -> token digests
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        """Get the cache key of a token"""
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[User]:
+        """Get the user of a token, if cached and not expired"""
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, token: str, user: User, token_expires_at: Optional[float]) -> None:
+        """Cache the user of a token until its TTL or the token expires"""
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+
+        key = self.digest(token)
+        with self._lock:
+            # Evict the oldest entries when full
+            while len(self._entries) >= self.max_entries:
+                self._discard(next(iter(self._entries)))
+            self._entries[key] = (user, expires_at)
+            self._by_user.setdefault(int(user.id), set()).add(key)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached token of a user"""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Get hit and miss counters and the number of entries"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+    def _discard(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        user_id = int(entry[0].id)
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
@@ -2,21 +2,43 @@
 Security utilities for authentication and authorization
 """
 
+import hashlib
+import secrets
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.hashing_pool import HashingPool
+from app.core.permission_cache import PermissionCache
+from app.core.principal_cache import PrincipalCache
+from app.db.database import get_async_db, get_db
+from app.models.user import User
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Threads for bcrypt, so hashing never blocks the event loop
+hashing_pool = HashingPool(settings.AUTH_HASH_WORKERS, settings.AUTH_HASH_MAX_PENDING)
+
 # JWT token scheme
 security = HTTPBearer()
 
+# Users resolved from access tokens
+principal_cache = PrincipalCache(
+    settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES
+)
+
+# Effective document permissions of users
+permission_cache = PermissionCache(
+    settings.PERMISSION_CACHE_MAX_ENTRIES, settings.PERMISSION_CACHE_TTL_SECONDS
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -28,6 +50,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the hashing pool"""
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password in the hashing pool"""
+    return await hashing_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -45,6 +77,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def create_refresh_token() -> str:
+    """Create an opaque refresh token"""
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(token: str) -> str:
+    """Hash a refresh token for storage and lookup"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
 def verify_token(token: str, credentials_exception):
     """Verify and decode JWT token"""
     from app.schemas.user import TokenData
@@ -56,41 +98,94 @@ def verify_token(token: str, credentials_exception):
         email = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, exp=payload.get("exp"))
     except JWTError:
         raise credentials_exception
     return token_data
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-):
-    """Get current authenticated user"""
-    from app.db.database import get_db
-    from app.db.repositories.user_repository import UserRepository
-
-    # Get database session
-    db = next(get_db())
-
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token_data = verify_token(credentials.credentials, credentials_exception)
+
+def _decode_credentials(token: str) -> Tuple[str, Optional[int]]:
+    """Get the email and expiry of a valid access token"""
+    token_data = verify_token(token, _credentials_exception())
     if token_data.email is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return token_data.email, token_data.exp
 
-    user_repo = UserRepository(db)
-    user = user_repo.get_by_email(token_data.email)
+
+def _cache_user(
+    token: str,
+    user: Optional[User],
+    expires_at: Optional[int],
+    db: Union[Session, AsyncSession],
+) -> User:
+    """Cache the user looked up for a token; 401 if there is none"""
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    # Detach, so the cached user outlives this session
+    db.expunge(user)
+    principal_cache.put(token, user, expires_at)
     return user
 
 
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+):
+    """Get current authenticated user.
+
+    Runs on the request-scoped session, which FastAPI shares with every
+    other Depends(get_db) of the same request and closes afterwards.
+    """
+    from app.db.repositories.user_repository import UserRepository
+
+    # Tokens seen recently skip decoding and the user lookup
+    token = credentials.credentials
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
+    email, expires_at = _decode_credentials(token)
+    user = UserRepository(db).get_by_email(email)
+    return _cache_user(token, user, expires_at, db)
+
+
 def get_current_active_user(current_user=Depends(get_current_user)):
     """Get current active user"""
     if not bool(current_user.is_active):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get current authenticated user without blocking the event loop"""
+    from app.db.repositories.async_user_repository import AsyncUserRepository
+
+    # Tokens seen recently skip decoding and the user lookup
+    token = credentials.credentials
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
+    email, expires_at = _decode_credentials(token)
+    user = await AsyncUserRepository(db).get_by_email(email)
+    return _cache_user(token, user, expires_at, db)
+
+
+async def get_current_active_user_async(
+    current_user=Depends(get_current_user_async),
+):
+    """Get current active user without blocking the event loop"""
+    if not bool(current_user.is_active):
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
@@ -0,0 +1,148 @@
+"""
+Query-plan regression check for the hot repository queries
+
+Runs the hot read queries of the document repositories against the
+configured database, explains each statement they issue and reports every
+full table scan. Usage: ``python -m app.db.query_plans`` (exit code 1 when a
+query scans a table).
+"""
+
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.db.repositories.document_repository import (
+    DocumentHistoryRepository,
+    DocumentRepository,
+)
+
+# IDs that match no row, so no query is answered from a cache
+SAMPLE_DOCUMENT_ID = "query-plan-check"
+SAMPLE_USER_ID = -1
+SAMPLE_CURSOR = (datetime(2000, 1, 1, tzinfo=timezone.utc), SAMPLE_DOCUMENT_ID)
+
+# Plan lines that read a whole table
+SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN (?!CONSTANT ROW)(\w+)"),
+    "postgresql": re.compile(r"\bSeq Scan on (\w+)"),
+}
+
+
+def hot_queries(db: Session) -> Dict[str, Callable[[], Any]]:
+    """Get the hot repository reads, by name"""
+    documents = DocumentRepository(db)
+    history = DocumentHistoryRepository(db)
+    user_id = SAMPLE_USER_ID
+    document_id = SAMPLE_DOCUMENT_ID
+    return {
+        "check_user_permission": lambda: documents.check_user_permission(
+            document_id, user_id
+        ),
+        "check_user_permissions": lambda: documents.check_user_permissions(
+            [document_id, document_id + "-2"], user_id
+        ),
+        "get_user_document_summaries": lambda: documents.get_user_document_summaries(
+            user_id, 50, SAMPLE_CURSOR
+        ),
+        "get_user_collaboration_summaries": (
+            lambda: documents.get_user_collaboration_summaries(
+                user_id, 50, SAMPLE_CURSOR
+            )
+        ),
+        "get_user_documents": lambda: documents.get_user_documents(user_id, 50),
+        "get_user_collaborations": lambda: documents.get_user_collaborations(
+            user_id, 50
+        ),
+        "get_document_history": lambda: history.get_document_history(document_id),
+        "get_checkpoint_base": lambda: history.get_checkpoint_base(document_id),
+        "get_yjs_update_rows": lambda: history.get_yjs_update_rows(document_id),
+        "get_documents_to_compact": lambda: history.get_documents_to_compact(1),
+    }
+
+
+def explain(db: Session, statement: str, parameters: Any) -> List[str]:
+    """Get the plan of a statement as text lines"""
+    connection = db.connection()
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        return [str(row[-1]) for row in rows]
+    rows = connection.exec_driver_sql("EXPLAIN " + statement, parameters)
+    return [str(row[0]) for row in rows]
+
+
+def check_query_plans(db: Session) -> Dict[str, List[Tuple[str, List[str]]]]:
+    """Explain every statement of the hot queries.
+
+    Returns query name -> [(statement, plan lines)]. On PostgreSQL
+    sequential scans are disabled for the check, so a small table still
+    reports an index scan when a usable index exists.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+    plans: Dict[str, List[Tuple[str, List[str]]]] = {}
+    for name, run_query in hot_queries(db).items():
+        captured: List[Tuple[str, Any]] = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                captured.append((statement, parameters))
+
+        event.listen(connection, "before_cursor_execute", capture)
+        try:
+            run_query()
+        finally:
+            event.remove(connection, "before_cursor_execute", capture)
+        plans[name] = [
+            (statement, explain(db, statement, parameters))
+            for statement, parameters in captured
+        ]
+    return plans
+
+
+def find_table_scans(
+    plans: Dict[str, List[Tuple[str, List[str]]]], dialect: str
+) -> Dict[str, List[str]]:
+    """Get the plan lines of each query that read a whole table"""
+    pattern = SCAN_PATTERNS.get(dialect)
+    if pattern is None:
+        raise ValueError(f"Query plans of {dialect} are not supported")
+    scans: Dict[str, List[str]] = {}
+    for name, statements in plans.items():
+        lines = [
+            line for _, plan in statements for line in plan if pattern.search(line)
+        ]
+        if lines:
+            scans[name] = lines
+    return scans
+
+
+def main() -> int:
+    db = SessionLocal()
+    try:
+        plans = check_query_plans(db)
+        scans = find_table_scans(plans, db.connection().dialect.name)
+    finally:
+        db.rollback()
+        db.close()
+
+    for name, statements in plans.items():
+        status = "SCAN" if name in scans else "ok"
+        print(f"[{status}] {name}")
+        for _, plan in statements:
+            for line in plan:
+                print(f"    {line}")
+    if scans:
+        print(f"{len(scans)} hot queries read whole tables: {', '.join(scans)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Async document repository for data access on the event loop
+
+Relationships are loaded eagerly: lazy loading is not available on an
+AsyncSession.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Row, and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.security import permission_cache
+from app.core.pagination import Cursor
+from app.db.repositories.document_repository import (
+    keyset_page,
+    permission_query,
+    user_collaboration_summaries_query,
+    user_document_summaries_query,
+)
+from app.models.document import Document, DocumentCollaborator, DocumentHistory
+
+
+class AsyncDocumentRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_by_id(self, document_id: str) -> Optional[Document]:
+        """Get document by ID, without relationships"""
+        return await self.db.get(Document, document_id)
+
+    async def get_with_relations(self, document_id: str) -> Optional[Document]:
+        """Get document by ID with owner, collaborators and history"""
+        result = await self.db.execute(
+            select(Document)
+            .options(
+                selectinload(Document.owner),
+                selectinload(Document.collaborators).selectinload(
+                    DocumentCollaborator.user
+                ),
+                selectinload(Document.history).selectinload(DocumentHistory.user),
+            )
+            .where(Document.id == document_id)
+        )
+        return result.scalars().first()
+
+    async def get_user_document_summaries(
+        self, user_id: int, limit: Optional[int] = None, after: Optional[Cursor] = None
+    ) -> Sequence[Row[Any]]:
+        """Get summary rows of documents owned by user"""
+        statement = user_document_summaries_query(user_id)
+        result = await self.db.execute(keyset_page(statement, limit, after))
+        return result.all()
+
+    async def get_user_collaboration_summaries(
+        self, user_id: int, limit: Optional[int] = None, after: Optional[Cursor] = None
+    ) -> Sequence[Row[Any]]:
+        """Get summary rows of documents user collaborates on"""
+        statement = user_collaboration_summaries_query(user_id)
+        result = await self.db.execute(keyset_page(statement, limit, after))
+        return result.all()
+
+    async def check_user_permission(
+        self, document_id: str, user_id: int
+    ) -> Optional[str]:
+        """Check user permission for document"""
+        permission = permission_cache.get(document_id, user_id)
+        if permission is None:
+            result = await self.db.execute(permission_query([document_id], user_id))
+            row = result.first()
+            permission = row.permission if row else None
+            permission_cache.put(document_id, user_id, permission)
+        return permission
+
+    async def check_user_permissions(
+        self, document_ids: List[str], user_id: int
+    ) -> Dict[str, Optional[str]]:
+        """Check user permission for many documents; missing ones are left out"""
+        permissions: Dict[str, Optional[str]] = {}
+        for document_id in document_ids:
+            permission = permission_cache.get(document_id, user_id)
+            if permission is not None:
+                permissions[document_id] = permission
+        missing = [
+            document_id
+            for document_id in document_ids
+            if document_id not in permissions
+        ]
+        if missing:
+            result = await self.db.execute(permission_query(missing, user_id))
+            for row in result.all():
+                permissions[row.id] = row.permission
+                permission_cache.put(row.id, user_id, row.permission)
+        return permissions
+
+
+class AsyncDocumentHistoryRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_checkpoint_base(self, document_id: str) -> Tuple[Optional[str], int]:
+        """Get the latest checkpoint update and the last history ID it covers"""
+        result = await self.db.execute(
+            select(DocumentHistory)
+            .where(
+                and_(
+                    DocumentHistory.document_id == document_id,
+                    DocumentHistory.operation_type == "checkpoint",
+                )
+            )
+            .order_by(DocumentHistory.id.desc())
+            .limit(1)
+        )
+        checkpoint = result.scalars().first()
+        if checkpoint is None:
+            return None, 0
+
+        try:
+            up_to_id = int(json.loads(checkpoint.extra_metadata or "{}")["up_to_id"])
+        except (KeyError, TypeError, ValueError):
+            up_to_id = checkpoint.id
+        return checkpoint.yjs_update, up_to_id
+
+    async def get_yjs_updates(self, document_id: str) -> List[str]:
+        """Get the updates needed to rebuild a document, oldest first"""
+        checkpoint_update, after_id = await self.get_checkpoint_base(document_id)
+        while True:
+            result = await self.db.execute(
+                select(DocumentHistory.yjs_update)
+                .where(
+                    and_(
+                        DocumentHistory.document_id == document_id,
+                        DocumentHistory.operation_type == "yjs_update",
+                        DocumentHistory.yjs_update.isnot(None),
+                        DocumentHistory.id > after_id,
+                    )
+                )
+                .order_by(DocumentHistory.id.asc())
+            )
+            rows = [update for update in result.scalars() if update is not None]
+            # A compaction committed between the reads deleted updates that
+            # only its new checkpoint holds; read again from that checkpoint
+            latest_update, latest_after_id = await self.get_checkpoint_base(document_id)
+            if latest_after_id == after_id:
+                break
+            checkpoint_update, after_id = latest_update, latest_after_id
+        updates = [checkpoint_update] if checkpoint_update else []
+        updates.extend(rows)
+        return updates
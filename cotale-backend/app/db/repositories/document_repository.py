@@ -2,14 +2,109 @@
 Document repository for data access operations
 """
 
+import json
 import uuid
-from typing import Optional, List
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from datetime import datetime
+from typing import Any, Dict, Optional, List, Sequence, Set, Tuple, TypeVar
+from sqlalchemy.orm import Query, Session, aliased, defer, joinedload
+from sqlalchemy import (
+    Row,
+    Select,
+    and_,
+    case,
+    func,
+    literal,
+    select,
+    tuple_,
+    update,
+)
 
+from app.core.pagination import Cursor
+from app.core.security import permission_cache
 from app.models.document import Document, DocumentCollaborator, DocumentHistory
 from app.schemas.document import DocumentCreate, DocumentUpdate
 
+PageQuery = TypeVar("PageQuery", Query, Select)
+
+
+def keyset_page(
+    query: PageQuery, limit: Optional[int] = None, after: Optional[Cursor] = None
+) -> PageQuery:
+    """Order documents by (updated_at, id), newest first, from a cursor on.
+
+    Seeking past the cursor instead of skipping an offset keeps every page
+    as cheap as the first one.
+    """
+    if after is not None:
+        query = query.filter(tuple_(Document.updated_at, Document.id) < after)
+    query = query.order_by(Document.updated_at.desc(), Document.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def permission_query(document_ids: List[str], user_id: int) -> Select:
+    """Build a query of (document ID, effective permission) for one user.
+
+    Owners get "admin", collaborators their own permission and everyone
+    else "read" on public documents; the permission is None otherwise.
+    """
+    permission = case(
+        (Document.owner_id == user_id, literal("admin")),
+        (DocumentCollaborator.id.isnot(None), DocumentCollaborator.permission),
+        (Document.is_public.is_(True), literal("read")),
+        else_=None,
+    )
+    return (
+        select(Document.id, permission.label("permission"))
+        .outerjoin(
+            DocumentCollaborator,
+            and_(
+                DocumentCollaborator.document_id == Document.id,
+                DocumentCollaborator.user_id == user_id,
+            ),
+        )
+        .where(Document.id.in_(document_ids))
+    )
+
+
+def summary_query() -> Select:
+    """Build a query of document summary rows with their collaborator count.
+
+    Only the listed columns are selected, so the content column is never
+    read and a row costs the same whatever the size of the script.
+    """
+    collaborators = aliased(DocumentCollaborator)
+    collaborator_count = (
+        select(func.count(collaborators.id))
+        .where(collaborators.document_id == Document.id)
+        .correlate(Document)
+        .scalar_subquery()
+    )
+    return select(
+        Document.id,
+        Document.title,
+        Document.owner_id,
+        Document.is_public,
+        Document.created_at,
+        Document.updated_at,
+        collaborator_count.label("collaborator_count"),
+    )
+
+
+def user_document_summaries_query(user_id: int) -> Select:
+    """Build a query of summary rows of documents owned by user"""
+    return summary_query().where(Document.owner_id == user_id)
+
+
+def user_collaboration_summaries_query(user_id: int) -> Select:
+    """Build a query of summary rows of documents user collaborates on"""
+    return (
+        summary_query()
+        .join(DocumentCollaborator, DocumentCollaborator.document_id == Document.id)
+        .where(DocumentCollaborator.user_id == user_id)
+    )
+
 
 class DocumentRepository:
     def __init__(self, db: Session):
@@ -29,24 +124,42 @@ class DocumentRepository:
             .first()
         )
 
-    def get_user_documents(self, user_id: int) -> List[Document]:
-        """Get all documents owned by user"""
-        return (
+    def get_user_documents(
+        self, user_id: int, limit: Optional[int] = None, after: Optional[Cursor] = None
+    ) -> List[Document]:
+        """Get documents owned by user; content is loaded on access"""
+        query = (
             self.db.query(Document)
+            .options(defer(Document.content))
             .filter(Document.owner_id == user_id)
-            .order_by(Document.updated_at.desc())
-            .all()
         )
+        return keyset_page(query, limit, after).all()
 
-    def get_user_collaborations(self, user_id: int) -> List[Document]:
-        """Get all documents user collaborates on"""
-        return (
+    def get_user_collaborations(
+        self, user_id: int, limit: Optional[int] = None, after: Optional[Cursor] = None
+    ) -> List[Document]:
+        """Get documents user collaborates on; content is loaded on access"""
+        query = (
             self.db.query(Document)
+            .options(defer(Document.content))
             .join(DocumentCollaborator)
             .filter(DocumentCollaborator.user_id == user_id)
-            .order_by(Document.updated_at.desc())
-            .all()
         )
+        return keyset_page(query, limit, after).all()
+
+    def get_user_document_summaries(
+        self, user_id: int, limit: Optional[int] = None, after: Optional[Cursor] = None
+    ) -> Sequence[Row[Any]]:
+        """Get summary rows of documents owned by user"""
+        statement = user_document_summaries_query(user_id)
+        return self.db.execute(keyset_page(statement, limit, after)).all()
+
+    def get_user_collaboration_summaries(
+        self, user_id: int, limit: Optional[int] = None, after: Optional[Cursor] = None
+    ) -> Sequence[Row[Any]]:
+        """Get summary rows of documents user collaborates on"""
+        statement = user_collaboration_summaries_query(user_id)
+        return self.db.execute(keyset_page(statement, limit, after)).all()
 
     def create(self, document_data: DocumentCreate, owner_id: int) -> Document:
         """Create a new document"""
@@ -73,31 +186,77 @@ class DocumentRepository:
 
         self.db.commit()
         self.db.refresh(document)
+        if "is_public" in update_data:
+            permission_cache.invalidate(str(document.id))
         return document
 
-    def update_content(self, document_id: str, content: str) -> Optional[Document]:
-        """Update document content"""
-        document = self.get_by_id(document_id)
-        if document:
-            # Use setattr to avoid type issues
-            setattr(document, "content", content)
-            self.db.commit()
-            self.db.refresh(document)
-        return document
+    def set_content(self, document_id: str, content: str) -> Optional[datetime]:
+        """Set document content without committing (caller commits).
+
+        Issues a single UPDATE ... RETURNING instead of loading the document;
+        returns the new updated_at, or None if the document does not exist.
+        Documents already loaded in the session are not refreshed.
+        """
+        return self.db.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(content=content, updated_at=func.now())
+            .returning(Document.updated_at)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+    def get_owner_id(self, document_id: str) -> Optional[int]:
+        """Get the owner ID of a document"""
+        row = (
+            self.db.query(Document.owner_id).filter(Document.id == document_id).first()
+        )
+        return row.owner_id if row else None
+
+    def get_existing_ids(self, document_ids: List[str]) -> Set[str]:
+        """Get which of the given document IDs still exist"""
+        rows = self.db.query(Document.id).filter(Document.id.in_(document_ids)).all()
+        return {row.id for row in rows}
 
     def delete(self, document: Document) -> None:
         """Delete document"""
+        document_id = str(document.id)
         self.db.delete(document)
         self.db.commit()
+        permission_cache.invalidate(document_id)
 
     def check_user_permission(self, document_id: str, user_id: int) -> Optional[str]:
         """Check user permission for document"""
-        # Check if user is owner
-        document = self.db.query(Document).filter(Document.id == document_id).first()
-        if document and document.owner_id == user_id:
-            return "admin"
+        permission = permission_cache.get(document_id, user_id)
+        if permission is None:
+            row = self.db.execute(permission_query([document_id], user_id)).first()
+            permission = row.permission if row else None
+            permission_cache.put(document_id, user_id, permission)
+        return permission
 
-        # Check if user is collaborator
+    def check_user_permissions(
+        self, document_ids: List[str], user_id: int
+    ) -> Dict[str, Optional[str]]:
+        """Check user permission for many documents; missing ones are left out"""
+        permissions: Dict[str, Optional[str]] = {}
+        for document_id in document_ids:
+            permission = permission_cache.get(document_id, user_id)
+            if permission is not None:
+                permissions[document_id] = permission
+        missing = [
+            document_id
+            for document_id in document_ids
+            if document_id not in permissions
+        ]
+        if missing:
+            for row in self.db.execute(permission_query(missing, user_id)):
+                permissions[row.id] = row.permission
+                permission_cache.put(row.id, user_id, row.permission)
+        return permissions
+
+    def add_collaborator(
+        self, document_id: str, user_id: int, permission: str = "edit"
+    ) -> DocumentCollaborator:
+        """Add collaborator to document, or change the role of an existing one"""
         collaborator = (
             self.db.query(DocumentCollaborator)
             .filter(
@@ -108,26 +267,16 @@ class DocumentRepository:
             )
             .first()
         )
-
         if collaborator:
-            return str(collaborator.permission)
-
-        # Check if document is public
-        if document and bool(document.is_public):
-            return "read"
-
-        return None
-
-    def add_collaborator(
-        self, document_id: str, user_id: int, permission: str = "edit"
-    ) -> DocumentCollaborator:
-        """Add collaborator to document"""
-        collaborator = DocumentCollaborator(
-            document_id=document_id, user_id=user_id, permission=permission
-        )
-        self.db.add(collaborator)
+            collaborator.permission = permission
+        else:
+            collaborator = DocumentCollaborator(
+                document_id=document_id, user_id=user_id, permission=permission
+            )
+            self.db.add(collaborator)
         self.db.commit()
         self.db.refresh(collaborator)
+        permission_cache.invalidate(document_id, user_id)
         return collaborator
 
     def remove_collaborator(self, document_id: str, user_id: int) -> bool:
@@ -146,6 +295,7 @@ class DocumentRepository:
         if collaborator:
             self.db.delete(collaborator)
             self.db.commit()
+            permission_cache.invalidate(document_id, user_id)
             return True
         return False
 
@@ -177,6 +327,20 @@ class DocumentHistoryRepository:
         self.db.refresh(history_entry)
         return history_entry
 
+    def add_yjs_updates(self, document_id: str, updates: List[Tuple[int, str]]) -> None:
+        """Add Y.js update entries without committing (caller commits)"""
+        self.db.add_all(
+            [
+                DocumentHistory(
+                    document_id=document_id,
+                    user_id=user_id,
+                    operation_type="yjs_update",
+                    yjs_update=yjs_update,
+                )
+                for user_id, yjs_update in updates
+            ]
+        )
+
     def get_document_history(
         self, document_id: str, limit: int = 50
     ) -> List[DocumentHistory]:
@@ -189,3 +353,134 @@ class DocumentHistoryRepository:
             .limit(limit)
             .all()
         )
+
+    def get_checkpoint_base(self, document_id: str) -> Tuple[Optional[str], int]:
+        """Get the latest checkpoint update and the last history ID it covers"""
+        checkpoint = (
+            self.db.query(DocumentHistory)
+            .filter(
+                and_(
+                    DocumentHistory.document_id == document_id,
+                    DocumentHistory.operation_type == "checkpoint",
+                )
+            )
+            .order_by(DocumentHistory.id.desc())
+            .first()
+        )
+        if checkpoint is None:
+            return None, 0
+
+        try:
+            up_to_id = int(json.loads(checkpoint.extra_metadata or "{}")["up_to_id"])
+        except (KeyError, TypeError, ValueError):
+            up_to_id = checkpoint.id
+        return checkpoint.yjs_update, up_to_id
+
+    def get_yjs_update_rows(
+        self, document_id: str, after_id: int = 0
+    ) -> List[Tuple[int, str]]:
+        """Get (id, update) of Y.js updates stored after a history ID, oldest first"""
+        rows = (
+            self.db.query(DocumentHistory.id, DocumentHistory.yjs_update)
+            .filter(
+                and_(
+                    DocumentHistory.document_id == document_id,
+                    DocumentHistory.operation_type == "yjs_update",
+                    DocumentHistory.yjs_update.isnot(None),
+                    DocumentHistory.id > after_id,
+                )
+            )
+            .order_by(DocumentHistory.id.asc())
+            .all()
+        )
+        return [(row.id, row.yjs_update) for row in rows]
+
+    def get_yjs_updates(self, document_id: str) -> List[str]:
+        """Get the updates needed to rebuild a document, oldest first.
+
+        Starts from the latest checkpoint, so the cost is proportional to the
+        updates stored since that checkpoint.
+        """
+        checkpoint_update, after_id = self.get_checkpoint_base(document_id)
+        while True:
+            rows = self.get_yjs_update_rows(document_id, after_id)
+            # A compaction committed between the reads deleted updates that
+            # only its new checkpoint holds; read again from that checkpoint
+            latest_update, latest_after_id = self.get_checkpoint_base(document_id)
+            if latest_after_id == after_id:
+                break
+            checkpoint_update, after_id = latest_update, latest_after_id
+        updates = [checkpoint_update] if checkpoint_update else []
+        updates.extend(update for _, update in rows)
+        return updates
+
+    def get_documents_to_compact(self, min_updates: int) -> List[str]:
+        """Get documents with at least min_updates uncompacted Y.js updates"""
+        rows = (
+            self.db.query(DocumentHistory.document_id)
+            .filter(DocumentHistory.operation_type == "yjs_update")
+            .group_by(DocumentHistory.document_id)
+            .having(func.count(DocumentHistory.id) >= min_updates)
+            .all()
+        )
+        return [row.document_id for row in rows]
+
+    def create_checkpoint(
+        self,
+        document_id: str,
+        user_id: int,
+        merged_update: str,
+        content_snapshot: str,
+        up_to_id: int,
+        keep_checkpoints: int,
+    ) -> DocumentHistory:
+        """Replace the Y.js updates up to a history ID with one checkpoint.
+
+        Only the newest keep_checkpoints checkpoints are retained, and
+        always at least the new one.
+        """
+        checkpoint = DocumentHistory(
+            document_id=document_id,
+            user_id=user_id,
+            operation_type="checkpoint",
+            content_snapshot=content_snapshot,
+            yjs_update=merged_update,
+            extra_metadata=json.dumps({"up_to_id": up_to_id}),
+        )
+        self.db.add(checkpoint)
+        # Insert first so the checkpoint holds the highest ID; SQLite would
+        # otherwise reuse the IDs of the deleted updates for new rows
+        self.db.flush()
+
+        # Drop the merged updates
+        self.db.query(DocumentHistory).filter(
+            and_(
+                DocumentHistory.document_id == document_id,
+                DocumentHistory.operation_type == "yjs_update",
+                DocumentHistory.id <= up_to_id,
+            )
+        ).delete(synchronize_session=False)
+        self.db.flush()
+
+        # Apply checkpoint retention
+        expired_ids = [
+            row.id
+            for row in self.db.query(DocumentHistory.id)
+            .filter(
+                and_(
+                    DocumentHistory.document_id == document_id,
+                    DocumentHistory.operation_type == "checkpoint",
+                )
+            )
+            .order_by(DocumentHistory.id.desc())
+            .offset(max(keep_checkpoints, 1))
+            .all()
+        ]
+        if expired_ids:
+            self.db.query(DocumentHistory).filter(
+                DocumentHistory.id.in_(expired_ids)
+            ).delete(synchronize_session=False)
+
+        self.db.commit()
+        self.db.refresh(checkpoint)
+        return checkpoint
@@ -0,0 +1,84 @@
+"""
+Refresh token repository for data access operations
+"""
+
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy.orm import Session, joinedload
+from app.models.user import RefreshToken
+
+
+class RefreshTokenRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_by_hash(self, token_hash: str) -> Optional[RefreshToken]:
+        """Get an unexpired refresh token and its user by token hash"""
+        return (
+            self.db.query(RefreshToken)
+            .options(joinedload(RefreshToken.user))
+            .filter(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.expires_at > datetime.now(timezone.utc),
+            )
+            .first()
+        )
+
+    def create(self, user_id: int, token_hash: str, expires_at: datetime) -> None:
+        """Store a new refresh token"""
+        self.db.add(
+            RefreshToken(user_id=user_id, token_hash=token_hash, expires_at=expires_at)
+        )
+        self.db.commit()
+
+    def rotate(
+        self, token: RefreshToken, token_hash: str, expires_at: datetime
+    ) -> bool:
+        """Revoke a token and store its successor; False if already revoked"""
+        # Conditional update, so concurrent refreshes cannot both rotate one token
+        revoked = (
+            self.db.query(RefreshToken)
+            .filter(RefreshToken.id == token.id, RefreshToken.revoked_at.is_(None))
+            .update(
+                {RefreshToken.revoked_at: datetime.now(timezone.utc)},
+                synchronize_session=False,
+            )
+        )
+        if not revoked:
+            self.db.rollback()
+            return False
+        self.db.add(
+            RefreshToken(
+                user_id=token.user_id, token_hash=token_hash, expires_at=expires_at
+            )
+        )
+        self.db.commit()
+        return True
+
+    def revoke(self, token_hash: str) -> None:
+        """Revoke a refresh token by token hash"""
+        self.db.query(RefreshToken).filter(
+            RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_(None)
+        ).update(
+            {RefreshToken.revoked_at: datetime.now(timezone.utc)},
+            synchronize_session=False,
+        )
+        self.db.commit()
+
+    def revoke_all_for_user(self, user_id: int) -> None:
+        """Revoke every refresh token of a user"""
+        self.db.query(RefreshToken).filter(
+            RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None)
+        ).update(
+            {RefreshToken.revoked_at: datetime.now(timezone.utc)},
+            synchronize_session=False,
+        )
+        self.db.commit()
+
+    def delete_expired(self, user_id: int) -> None:
+        """Delete the expired refresh tokens of a user"""
+        self.db.query(RefreshToken).filter(
+            RefreshToken.user_id == user_id,
+            RefreshToken.expires_at <= datetime.now(timezone.utc),
+        ).delete(synchronize_session=False)
+        self.db.commit()
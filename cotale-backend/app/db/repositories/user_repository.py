@@ -6,7 +6,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.security import get_password_hash
+from app.core.security import principal_cache
 
 
 class UserRepository:
@@ -25,9 +25,8 @@ class UserRepository:
         """Get user by username"""
         return self.db.query(User).filter(User.username == username).first()
 
-    def create(self, user_data: UserCreate) -> User:
+    def create(self, user_data: UserCreate, hashed_password: str) -> User:
         """Create a new user"""
-        hashed_password = get_password_hash(user_data.password)
         db_user = User(
             email=user_data.email,
             username=user_data.username,
@@ -45,9 +44,12 @@ class UserRepository:
                 setattr(user, key, value)
         self.db.commit()
         self.db.refresh(user)
+        principal_cache.invalidate_user(int(user.id))
         return user
 
     def delete(self, user: User) -> None:
         """Delete user"""
+        user_id = int(user.id)
         self.db.delete(user)
         self.db.commit()
+        principal_cache.invalidate_user(user_id)
@@ -2,21 +2,46 @@
 CoTale Backend Application
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
+from app.api.deps import get_websocket_service
 from app.api.v1 import auth
+from app.core.security import hashing_pool, permission_cache, principal_cache
+from app.db.database import SessionLocal
+from app.services.compaction_service import HistoryCompactor
 
 # from app.api.v1 import documents  # websocket temporarily disabled
 # from app.api.v1 import websocket
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background services"""
+    websocket_service = get_websocket_service()
+    history_compactor = HistoryCompactor(
+        SessionLocal,
+        settings.HISTORY_COMPACTION_INTERVAL,
+        settings.HISTORY_COMPACTION_MIN_UPDATES,
+        settings.HISTORY_KEEP_CHECKPOINTS,
+    )
+    await websocket_service.start()
+    history_compactor.start()
+    yield
+    await history_compactor.stop()
+    await websocket_service.stop()
+    hashing_pool.shutdown()
+
+
 # Create FastAPI application
 app = FastAPI(
     title="CoTale API",
     version="1.0.0",
     description="Collaborative TRPG script editor with AI assistant",
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -26,6 +51,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "X-Next-Cursor"],
 )
 
 # Include routers
@@ -46,6 +72,28 @@ async def health_check():
     return {"status": "healthy", "service": "cotale-api"}
 
 
+@app.get("/api/health/auth-cache")
+async def auth_cache_health_check():
+    """Hit and miss counters of the authenticated user cache"""
+    return principal_cache.stats()
+
+
+@app.get("/api/health/permission-cache")
+async def permission_cache_health_check():
+    """Hit and miss counters of the document permission cache"""
+    return permission_cache.stats()
+
+
+@app.get("/api/health/ws")
+async def websocket_health_check(response: Response):
+    """WebSocket occupancy for load balancers (503 when full)"""
+    occupancy = get_websocket_service().get_occupancy()
+    if not occupancy["accepting"]:
+        response.status_code = 503
+        response.headers["Retry-After"] = str(settings.WS_RETRY_AFTER_SECONDS)
+    return occupancy
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -4,7 +4,17 @@ Document and collaboration models
 
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
-from sqlalchemy import Integer, String, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import (
+    Integer,
+    String,
+    DateTime,
+    Boolean,
+    Text,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+)
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from sqlalchemy.sql import func
 from app.models.user import Base
@@ -15,6 +25,10 @@ if TYPE_CHECKING:
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        # Listings of a user's documents, paged by (updated_at, id)
+        Index("ix_documents_owner_id_updated_at", "owner_id", "updated_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, index=True)  # custom ID
     title: Mapped[str] = mapped_column(
@@ -28,8 +42,15 @@ class Document(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
+    # Set on insert too: listings page by (updated_at, id). SQLite compares
+    # datetimes as text, so bound values are kept in the CURRENT_TIMESTAMP
+    # format (without microseconds) of the stored ones.
     updated_at: Mapped[Optional[datetime]] = mapped_column(
-        DateTime(timezone=True), onupdate=func.now()
+        DateTime(timezone=True).with_variant(
+            sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+        ),
+        server_default=func.now(),
+        onupdate=func.now(),
     )
 
     # Relationships
@@ -49,6 +70,16 @@ class Document(Base):
 
 class DocumentCollaborator(Base):
     __tablename__ = "document_collaborators"
+    __table_args__ = (
+        # One role per user and document; also serves permission lookups
+        UniqueConstraint(
+            "document_id",
+            "user_id",
+            name="uq_document_collaborators_document_id_user_id",
+        ),
+        # Collaborations of a user
+        Index("ix_document_collaborators_user_id", "user_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     document_id: Mapped[str] = mapped_column(
@@ -76,6 +107,25 @@ class DocumentCollaborator(Base):
 
 class DocumentHistory(Base):
     __tablename__ = "document_history"
+    __table_args__ = (
+        # History listing, newest first
+        Index(
+            "ix_document_history_document_id_created_at", "document_id", "created_at"
+        ),
+        # Checkpoint lookup and Y.js update replay, by ID
+        Index(
+            "ix_document_history_document_id_operation_type_id",
+            "document_id",
+            "operation_type",
+            "id",
+        ),
+        # Y.js update counts per document, for history compaction
+        Index(
+            "ix_document_history_operation_type_document_id",
+            "operation_type",
+            "document_id",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     document_id: Mapped[str] = mapped_column(
@@ -2,10 +2,10 @@
 AI service for content generation and suggestions
 """
 
-import json
 from fastapi import WebSocket
 
 from app.core.config import settings
+from app.services.websocket_service import encode_frame
 
 
 class AIService:
@@ -41,12 +41,14 @@ class AIService:
             }
 
             # Send to requesting user
-            await websocket.send_text(json.dumps(ai_response))
+            websocket_service.send_frame(
+                websocket, document_id, encode_frame(ai_response)
+            )
 
             # Also broadcast to other users (let them see AI suggestions)
-            await websocket_service.broadcast_to_document(
+            websocket_service.broadcast_frame(
                 document_id,
-                {**ai_response, "type": "ai_suggestion_broadcast"},
+                encode_frame({**ai_response, "type": "ai_suggestion_broadcast"}),
                 exclude_websocket=websocket,
             )
 
@@ -57,7 +59,9 @@ class AIService:
                 "error": str(e),
                 "user_id": user_id,
             }
-            await websocket.send_text(json.dumps(error_response))
+            websocket_service.send_frame(
+                websocket, document_id, encode_frame(error_response)
+            )
 
     async def _generate_ai_response(self, prompt: str) -> str:
         """Generate AI response using OpenAI API"""
@@ -0,0 +1,96 @@
+"""
+Async document service for the hot read paths
+"""
+
+import base64
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException, status
+
+from app.core.pagination import decode_cursor
+from app.db.repositories.async_document_repository import (
+    AsyncDocumentRepository,
+    AsyncDocumentHistoryRepository,
+)
+from app.models.document import Document
+from app.models.user import User
+from app.schemas.document import DocumentSummary
+from app.services.document_service import to_summary_page
+
+
+class AsyncDocumentService:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+        self.document_repo = AsyncDocumentRepository(db)
+        self.history_repo = AsyncDocumentHistoryRepository(db)
+
+    async def get_document(
+        self,
+        document_id: str,
+        user: Optional[User] = None,
+        with_relations: bool = True,
+    ) -> Optional[Document]:
+        """Get document by ID with permission check"""
+        if with_relations:
+            document = await self.document_repo.get_with_relations(document_id)
+        else:
+            document = await self.document_repo.get_by_id(document_id)
+
+        if not document:
+            return None
+
+        # Check permissions if user is provided
+        if user:
+            permission = await self.document_repo.check_user_permission(
+                document_id, int(user.id)
+            )
+            if not permission:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="No permission to access this document",
+                )
+
+        return document
+
+    async def get_yjs_updates(self, document_id: str) -> List[bytes]:
+        """Get the stored Y.js updates of a document, oldest first"""
+        return [
+            base64.b64decode(update)
+            for update in await self.history_repo.get_yjs_updates(document_id)
+        ]
+
+    async def get_user_document_summaries(
+        self, user: User, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> Tuple[List[DocumentSummary], Optional[str]]:
+        """Get a page of summaries of documents owned by user"""
+        rows = await self.document_repo.get_user_document_summaries(
+            int(user.id),
+            limit + 1 if limit is not None else None,
+            decode_cursor(cursor) if cursor else None,
+        )
+        return to_summary_page(rows, limit)
+
+    async def get_user_collaboration_summaries(
+        self, user: User, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> Tuple[List[DocumentSummary], Optional[str]]:
+        """Get a page of summaries of documents user collaborates on"""
+        rows = await self.document_repo.get_user_collaboration_summaries(
+            int(user.id),
+            limit + 1 if limit is not None else None,
+            decode_cursor(cursor) if cursor else None,
+        )
+        return to_summary_page(rows, limit)
+
+    async def check_user_permission(
+        self, document_id: str, user: User
+    ) -> Optional[str]:
+        """Check user permission for document"""
+        return await self.document_repo.check_user_permission(document_id, int(user.id))
+
+    async def check_user_permissions(
+        self, document_ids: List[str], user: User
+    ) -> Dict[str, Optional[str]]:
+        """Check user permission for many documents at once"""
+        return await self.document_repo.check_user_permissions(
+            document_ids, int(user.id)
+        )
@@ -3,14 +3,21 @@ Authentication service for business logic
 """
 
 from typing import Optional
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
+from app.db.repositories.refresh_token_repository import RefreshTokenRepository
 from app.db.repositories.user_repository import UserRepository
 from app.schemas.user import UserCreate, UserLogin, Token
 from app.models.user import User
-from app.core.security import verify_password, create_access_token
+from app.core.security import (
+    create_access_token,
+    create_refresh_token,
+    hash_refresh_token,
+    get_password_hash_async,
+    verify_password_async,
+)
 from app.core.config import settings
 
 
@@ -18,8 +25,9 @@ class AuthService:
     def __init__(self, db: Session):
         self.db = db
         self.user_repo = UserRepository(db)
+        self.refresh_token_repo = RefreshTokenRepository(db)
 
-    def register_user(self, user_data: UserCreate) -> User:
+    async def register_user(self, user_data: UserCreate) -> User:
         """Register a new user"""
         # Check if user already exists
         if self.user_repo.get_by_email(user_data.email):
@@ -34,26 +42,29 @@ class AuthService:
             )
 
         # Create new user
+        hashed_password = await get_password_hash_async(user_data.password)
         try:
-            return self.user_repo.create(user_data)
+            return self.user_repo.create(user_data, hashed_password)
         except Exception as _e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="User registration failed",
             )
 
-    def authenticate_user(self, email: str, password: str) -> Optional[User]:
+    async def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password"""
         user = self.user_repo.get_by_email(email)
         if not user:
             return None
-        if not verify_password(password, str(user.hashed_password)):
+        if not await verify_password_async(password, str(user.hashed_password)):
             return None
         return user
 
-    def login_user(self, user_credentials: UserLogin) -> Token:
+    async def login_user(self, user_credentials: UserLogin) -> Token:
         """Login user and return access token"""
-        user = self.authenticate_user(user_credentials.email, user_credentials.password)
+        user = await self.authenticate_user(
+            user_credentials.email, user_credentials.password
+        )
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -61,9 +72,58 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        self.refresh_token_repo.delete_expired(user.id)
+        return self._issue_tokens(user)
+
+    def refresh_tokens(self, refresh_token: str) -> Token:
+        """Exchange a refresh token for a new access and refresh token"""
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+        stored = self.refresh_token_repo.get_by_hash(hash_refresh_token(refresh_token))
+        if not stored or not stored.user.is_active:
+            raise credentials_exception
+
+        new_refresh_token = create_refresh_token()
+        if stored.revoked_at is not None or not self.refresh_token_repo.rotate(
+            stored, hash_refresh_token(new_refresh_token), self._refresh_expiry()
+        ):
+            # A rotated token was presented again, so it may have leaked:
+            # end every session of the user
+            self.refresh_token_repo.revoke_all_for_user(stored.user_id)
+            raise credentials_exception
+
+        return self._create_token(stored.user, new_refresh_token)
+
+    def revoke_refresh_token(self, refresh_token: str) -> None:
+        """Revoke a refresh token, e.g. on logout"""
+        self.refresh_token_repo.revoke(hash_refresh_token(refresh_token))
+
+    def _issue_tokens(self, user: User) -> Token:
+        """Create an access token and a new refresh token for a user"""
+        refresh_token = create_refresh_token()
+        self.refresh_token_repo.create(
+            user.id, hash_refresh_token(refresh_token), self._refresh_expiry()
+        )
+        return self._create_token(user, refresh_token)
+
+    def _create_token(self, user: User, refresh_token: str) -> Token:
         access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
             data={"sub": user.email}, expires_delta=access_token_expires
         )
 
-        return Token(access_token=access_token, token_type="bearer")
+        return Token(
+            access_token=access_token,
+            token_type="bearer",
+            refresh_token=refresh_token,
+        )
+
+    @staticmethod
+    def _refresh_expiry() -> datetime:
+        return datetime.now(timezone.utc) + timedelta(
+            days=settings.REFRESH_TOKEN_EXPIRE_DAYS
+        )
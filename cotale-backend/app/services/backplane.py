@@ -0,0 +1,203 @@
+"""
+Pub/sub backplane relaying WebSocket traffic between processes
+
+Every worker publishes its room broadcasts and presence snapshots to the
+backplane and delivers what other workers publish to its own sockets, so
+collaborators on different workers still see each other.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[bytes], Awaitable[None]]
+
+# Messages waiting to be published, per backplane; the oldest are dropped
+# when the broker cannot keep up
+DEFAULT_QUEUE_SIZE = 10000
+
+
+def encode_envelope(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    """Pack a JSON header and a raw payload into one backplane message"""
+    return json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n" + payload
+
+
+def decode_envelope(data: bytes) -> Tuple[Dict[str, Any], bytes]:
+    """Split a backplane message into its JSON header and raw payload"""
+    header, _, payload = data.partition(b"\n")
+    return json.loads(header), payload
+
+
+def enqueue_message(queue: "asyncio.Queue[bytes]", message: bytes) -> bool:
+    """Queue a message, dropping the oldest one when full; False if dropped"""
+    try:
+        queue.put_nowait(message)
+        return True
+    except asyncio.QueueFull:
+        queue.get_nowait()
+        queue.put_nowait(message)
+        return False
+
+
+class Backplane:
+    """Base class for backplane implementations"""
+
+    async def start(self, handler: MessageHandler) -> None:
+        """Subscribe and deliver every published message to handler"""
+        raise NotImplementedError
+
+    def publish(self, message: bytes) -> None:
+        """Publish a message without waiting; order is preserved"""
+        raise NotImplementedError
+
+    @property
+    def is_active(self) -> bool:
+        """Check if published messages can reach another worker"""
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        """Unsubscribe and release resources"""
+        raise NotImplementedError
+
+
+class InMemoryHub:
+    """Shared channel for InMemoryBackplane instances in one process"""
+
+    def __init__(self) -> None:
+        self.subscribers: List[MessageHandler] = []
+
+
+class InMemoryBackplane(Backplane):
+    """Process-local backplane, for single-worker setups.
+
+    Services whose backplanes share one InMemoryHub behave like separate
+    workers connected through a real broker.
+    """
+
+    def __init__(
+        self, hub: Optional[InMemoryHub] = None, queue_size: int = DEFAULT_QUEUE_SIZE
+    ) -> None:
+        self.hub = hub or InMemoryHub()
+        self._handler: Optional[MessageHandler] = None
+        self._queue: "asyncio.Queue[bytes]" = asyncio.Queue(queue_size)
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    async def start(self, handler: MessageHandler) -> None:
+        self._handler = handler
+        self.hub.subscribers.append(handler)
+        self._task = asyncio.create_task(self._deliver_loop())
+
+    def publish(self, message: bytes) -> None:
+        if not self.is_active:
+            return
+        if not enqueue_message(self._queue, message):
+            logger.warning("Backplane queue full, oldest message dropped")
+
+    @property
+    def is_active(self) -> bool:
+        return self._task is not None and len(self.hub.subscribers) > 1
+
+    async def stop(self) -> None:
+        if self._handler is not None and self._handler in self.hub.subscribers:
+            self.hub.subscribers.remove(self._handler)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _deliver_loop(self) -> None:
+        while True:
+            message = await self._queue.get()
+            for handler in list(self.hub.subscribers):
+                try:
+                    await handler(message)
+                except Exception:
+                    logger.exception("Backplane handler failed")
+
+
+class RedisBackplane(Backplane):
+    """Backplane on Redis pub/sub, for multiple workers and nodes.
+
+    Requires the redis extra (``uv sync --extra redis``). While Redis is
+    unreachable at most queue_size messages wait to be published.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        channel: str = "cotale:ws",
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        self.url = url
+        self.channel = channel
+        self._redis: Any = None
+        self._pubsub: Any = None
+        self._handler: Optional[MessageHandler] = None
+        self._queue: "asyncio.Queue[bytes]" = asyncio.Queue(queue_size)
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    async def start(self, handler: MessageHandler) -> None:
+        import redis.asyncio as redis
+
+        self._handler = handler
+        self._redis = redis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._tasks = [
+            asyncio.create_task(self._read_loop()),
+            asyncio.create_task(self._write_loop()),
+        ]
+
+    def publish(self, message: bytes) -> None:
+        if not self.is_active:
+            return
+        if not enqueue_message(self._queue, message):
+            logger.warning("Redis backplane queue full, oldest message dropped")
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self._tasks)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.aclose()
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _read_loop(self) -> None:
+        assert self._handler is not None
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message["type"] == "message":
+                        await self._handler(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis backplane subscription failed, retrying")
+                await asyncio.sleep(1)
+
+    async def _write_loop(self) -> None:
+        while True:
+            message = await self._queue.get()
+            try:
+                await self._redis.publish(self.channel, message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis backplane publish failed, message dropped")
+
+
+def create_backplane(url: str, queue_size: int = DEFAULT_QUEUE_SIZE) -> Backplane:
+    """Create a backplane from a URL (memory:// or redis://)"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackplane(url, queue_size=queue_size)
+    if url.startswith("memory://"):
+        return InMemoryBackplane(queue_size=queue_size)
+    raise ValueError(f"Unsupported WebSocket backplane URL: {url}")
@@ -0,0 +1,76 @@
+"""
+Compaction of stored Y.js updates into periodic checkpoints
+"""
+
+import asyncio
+import logging
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+
+from app.db.repositories.document_repository import DocumentHistoryRepository
+from app.services.crdt_service import HAS_CRDT
+from app.services.document_service import DocumentService
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCompactor:
+    """Periodically merges runs of yjs_update history rows into checkpoints.
+
+    A document is compacted once it has min_updates updates since its last
+    checkpoint; only the newest keep_checkpoints checkpoints are retained.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval_seconds: float,
+        min_updates: int,
+        keep_checkpoints: int,
+    ) -> None:
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.min_updates = min_updates
+        self.keep_checkpoints = keep_checkpoints
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        """Start the periodic compaction task (needs pycrdt)"""
+        if HAS_CRDT and self._task is None:
+            self._task = asyncio.create_task(self._compact_periodically())
+
+    async def stop(self) -> None:
+        """Stop the periodic compaction task"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def compact_all(self) -> int:
+        """Compact every document over the threshold; returns how many"""
+        db = self.session_factory()
+        try:
+            document_ids = DocumentHistoryRepository(db).get_documents_to_compact(
+                self.min_updates
+            )
+            document_service = DocumentService(db)
+            compacted = 0
+            for document_id in document_ids:
+                try:
+                    if document_service.compact_history(
+                        document_id, self.keep_checkpoints
+                    ):
+                        compacted += 1
+                except Exception:
+                    db.rollback()
+                    logger.exception("Failed to compact history of %s", document_id)
+            return compacted
+        finally:
+            db.close()
+
+    async def _compact_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await asyncio.to_thread(self.compact_all)
+            except Exception:
+                logger.exception("History compaction failed")
@@ -0,0 +1,346 @@
+"""
+Connection registry for real-time collaboration
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional
+from fastapi import WebSocket
+
+from app.services.crdt_service import HAS_CRDT, merge_updates
+from app.services.presence_service import merge_cursor_batches
+from app.services.ws_protocol import (
+    FRAME_YJS_UPDATE,
+    Frame,
+    encode_binary_frame,
+    extract_yjs_update,
+    frame_size,
+    replace_yjs_update,
+)
+
+# Kinds of frames a lagging connection may coalesce
+FRAME_KIND_CURSOR = "cursor"  # cursor_batch text frames
+FRAME_KIND_YJS = "yjs"  # Y.js update frames, binary or JSON
+
+# Slow consumer policies
+POLICY_COALESCE = "coalesce"
+POLICY_DISCONNECT = "disconnect"
+
+
+class ConnectionWriter:
+    """Bounded outbound buffer drained by a dedicated writer task.
+
+    Broadcasts only enqueue frames, so a slow socket never blocks the sender
+    or the other collaborators in the same document. Once more than
+    high_water bytes are waiting the consumer is lagging: with the coalesce
+    policy new cursor batches are merged into the queued one and new Y.js
+    updates into the queued update of the same encoding; with the disconnect
+    policy, or when max_frames or max_bytes is exceeded, the connection
+    overflows and the client has to resync. The byte limits apply to the
+    frames queued behind the next one to send, so a single frame larger
+    than max_bytes still goes out.
+    """
+
+    __slots__ = (
+        "websocket",
+        "max_frames",
+        "max_bytes",
+        "high_water",
+        "policy",
+        "frames",
+        "buffered_bytes",
+        "overflowed",
+        "closed",
+        "task",
+        "_ready",
+        "_idle",
+        "_mergeable",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_frames: int,
+        max_bytes: int,
+        high_water: int,
+        policy: str = POLICY_COALESCE,
+    ) -> None:
+        self.websocket = websocket
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.high_water = high_water
+        self.policy = policy
+        self.frames: Deque[List[Any]] = (
+            deque()
+        )  # [frame, kind, size in bytes] waiting to be sent
+        self.buffered_bytes = 0  # size of queued frames
+        self.overflowed = False  # gave up because the consumer fell behind
+        self.closed = False
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._ready = asyncio.Event()
+        self._idle = asyncio.Event()  # set while nothing is queued or sending
+        self._idle.set()
+        self._mergeable: Dict[str, List[Any]] = {}  # kind -> newest queued entry
+
+    def start(self, on_failure: Callable[[], None]) -> None:
+        """Start the writer task; on_failure runs if a send fails"""
+        self.task = asyncio.create_task(self._run(on_failure))
+
+    def enqueue(self, frame: Frame, kind: Optional[str] = None) -> bool:
+        """Queue a frame without waiting; False if the connection is dead or full"""
+        if self.closed:
+            return False
+
+        size = frame_size(frame)
+        backlog = self.buffered_bytes - self.frames[0][2] if self.frames else 0
+        if self.frames and backlog + size > self.high_water:
+            if self.policy != POLICY_COALESCE:
+                return self._overflow()
+            entry = self._mergeable.get(kind) if kind is not None else None
+            if entry is not None and self._merge(entry, frame):
+                backlog = self.buffered_bytes - self.frames[0][2]
+                return backlog <= self.max_bytes or self._overflow()
+
+        if self.frames and (
+            len(self.frames) >= self.max_frames or backlog + size > self.max_bytes
+        ):
+            return self._overflow()
+
+        entry = [frame, kind, size]
+        self.frames.append(entry)
+        self.buffered_bytes += size
+        if kind is not None:
+            self._mergeable[kind] = entry
+        self._idle.clear()
+        self._ready.set()
+        return True
+
+    async def drain(self, timeout: float) -> bool:
+        """Wait until every queued frame is sent; False on timeout"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def stop(self) -> None:
+        """Stop the writer task and reject further frames"""
+        self.closed = True
+        self.frames.clear()
+        self._mergeable.clear()
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def _merge(self, entry: List[Any], frame: Frame) -> bool:
+        """Fold a frame into a queued frame of the same kind, if possible"""
+        queued, kind, queued_size = entry
+        merged: Optional[Frame] = None
+        if kind == FRAME_KIND_CURSOR:
+            if isinstance(queued, str) and isinstance(frame, str):
+                merged = merge_cursor_batches(queued, frame)
+        elif kind == FRAME_KIND_YJS and HAS_CRDT:
+            # Clients only receive the encoding they were sent, so binary
+            # updates merge with binary ones and JSON updates with JSON ones
+            queued_update = extract_yjs_update(queued)
+            update = extract_yjs_update(frame)
+            if queued_update is not None and update is not None:
+                if isinstance(queued, bytes) and isinstance(frame, bytes):
+                    merged = encode_binary_frame(
+                        FRAME_YJS_UPDATE, merge_updates(queued_update, update)
+                    )
+                elif isinstance(queued, str) and isinstance(frame, str):
+                    merged = replace_yjs_update(
+                        frame, merge_updates(queued_update, update)
+                    )
+        if merged is None:
+            return False
+
+        size = frame_size(merged)
+        self.buffered_bytes += size - queued_size
+        entry[0] = merged
+        entry[2] = size
+        return True
+
+    def _overflow(self) -> bool:
+        self.overflowed = True
+        return False
+
+    async def _run(self, on_failure: Callable[[], None]) -> None:
+        try:
+            while True:
+                while not self.frames:
+                    self._idle.set()
+                    self._ready.clear()
+                    await self._ready.wait()
+                frame, kind, size = entry = self.frames.popleft()
+                if self._mergeable.get(kind) is entry:
+                    del self._mergeable[kind]
+                self.buffered_bytes -= size
+
+                if isinstance(frame, bytes):
+                    await self.websocket.send_bytes(frame)
+                else:
+                    await self.websocket.send_text(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.closed = True
+            on_failure()
+
+
+class Connection:
+    """One accepted socket, with the user and permission resolved at connect"""
+
+    __slots__ = (
+        "websocket",
+        "document_id",
+        "user_id",
+        "user_name",
+        "email",
+        "permission",
+        "writer",
+        "spectator",
+        "last_seen",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        document_id: str,
+        user_id: str,
+        user_name: str,
+        email: str,
+        permission: str,
+        writer: ConnectionWriter,
+        spectator: bool = False,
+    ) -> None:
+        self.websocket = websocket
+        self.document_id = document_id
+        self.user_id = user_id
+        self.user_name = user_name
+        self.email = email
+        self.permission = permission
+        self.writer = writer
+        # Admitted over the room limit: read-only, without presence or cursors
+        self.spectator = spectator
+        self.last_seen = time.monotonic()  # when the client last sent a frame
+
+    @property
+    def can_edit(self) -> bool:
+        """Check if the connection may modify the document"""
+        return self.permission in ["edit", "admin"]
+
+
+class ConnectionRegistry:
+    """Active connections indexed by document and by websocket identity"""
+
+    def __init__(self) -> None:
+        self._by_socket: Dict[int, Connection] = {}  # id(websocket) -> connection
+        self._by_document: Dict[str, Dict[int, Connection]] = (
+            {}
+        )  # document_id -> id(websocket) -> connection
+        self._users: Dict[str, Dict[str, Dict]] = (
+            {}
+        )  # document_id -> user_id -> user info
+        self._user_sockets: Dict[str, Dict[str, int]] = (
+            {}
+        )  # document_id -> user_id -> open connection count
+        self._spectators: Dict[str, int] = {}  # document_id -> spectator count
+
+    def add(self, connection: Connection) -> None:
+        """Register a connection"""
+        key = id(connection.websocket)
+        document_id = connection.document_id
+        self._by_socket[key] = connection
+        self._by_document.setdefault(document_id, {})[key] = connection
+        if connection.spectator:
+            self._spectators[document_id] = self._spectators.get(document_id, 0) + 1
+            return
+
+        user_sockets = self._user_sockets.setdefault(document_id, {})
+        user_sockets[connection.user_id] = user_sockets.get(connection.user_id, 0) + 1
+        self._users.setdefault(document_id, {})[connection.user_id] = {
+            "user_name": connection.user_name,
+            "permission": connection.permission,
+            "email": connection.email,
+        }
+
+    def remove(self, websocket: WebSocket) -> Optional[Connection]:
+        """Unregister a connection; returns it if it was registered"""
+        connection = self._by_socket.pop(id(websocket), None)
+        if connection is None:
+            return None
+
+        document_id = connection.document_id
+        room = self._by_document[document_id]
+        del room[id(websocket)]
+        if not room:
+            del self._by_document[document_id]
+
+        if connection.spectator:
+            self._spectators[document_id] -= 1
+            if not self._spectators[document_id]:
+                del self._spectators[document_id]
+            return connection
+
+        user_sockets = self._user_sockets[document_id]
+        user_sockets[connection.user_id] -= 1
+        if not user_sockets[connection.user_id]:
+            del user_sockets[connection.user_id]
+            del self._users[document_id][connection.user_id]
+        if not user_sockets:
+            del self._user_sockets[document_id]
+            del self._users[document_id]
+        return connection
+
+    def set_permission(self, connection: Connection, permission: str) -> None:
+        """Change the permission of a registered connection in place"""
+        connection.permission = permission
+        users = self._users.get(connection.document_id, {})
+        if not connection.spectator and connection.user_id in users:
+            users[connection.user_id]["permission"] = permission
+
+    def get(self, websocket: WebSocket) -> Optional[Connection]:
+        """Get the connection registered for a websocket"""
+        return self._by_socket.get(id(websocket))
+
+    def connections(self, document_id: str) -> Iterable[Connection]:
+        """Get all connections of a document"""
+        return self._by_document.get(document_id, {}).values()
+
+    def has_user(self, document_id: str, user_id: str) -> bool:
+        """Check if a user still has an open connection to a document"""
+        return user_id in self._users.get(document_id, {})
+
+    def users(self, document_id: str) -> Dict[str, Dict]:
+        """Get user info of everyone connected to a document"""
+        return self._users.get(document_id, {})
+
+    def count(self, document_id: str) -> int:
+        """Get number of connections to a document"""
+        return len(self._by_document.get(document_id, {}))
+
+    def spectator_count(self, document_id: Optional[str] = None) -> int:
+        """Get number of spectators of a document, or of all documents"""
+        if document_id is None:
+            return sum(self._spectators.values())
+        return self._spectators.get(document_id, 0)
+
+    def document_ids(self) -> List[str]:
+        """Get the documents with at least one connection"""
+        return list(self._by_document)
+
+    def document_count(self) -> int:
+        """Get number of documents with at least one connection"""
+        return len(self._by_document)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._by_document
+
+    def __len__(self) -> int:
+        return len(self._by_socket)
+
+    def __iter__(self) -> Iterator[Connection]:
+        # Snapshot, so connections can be removed while iterating
+        return iter(list(self._by_socket.values()))
@@ -0,0 +1,78 @@
+"""
+Server-side Y.js documents for active collaboration rooms
+
+Uses the pycrdt package. Without it the server falls back to relaying
+opaque Y.js updates.
+"""
+
+import hashlib
+from typing import Iterable, Optional
+
+try:
+    import pycrdt
+except ImportError:  # pragma: no cover - optional dependency
+    pycrdt = None
+
+# Whether server-side Y.js documents are available
+HAS_CRDT = pycrdt is not None
+
+# Name of the shared Y.Text holding the script
+TEXT_NAME = "content"
+
+# State vector of an empty Y.js document
+EMPTY_STATE_VECTOR = b"\x00"
+
+
+def merge_updates(*updates: bytes) -> bytes:
+    """Merge Y.js updates into one equivalent update"""
+    if pycrdt is None:
+        raise RuntimeError("pycrdt is required to merge Y.js updates")
+    return pycrdt.merge_updates(*updates)
+
+
+class RoomDocument:
+    """Authoritative Y.js document merging every update of one room"""
+
+    def __init__(self, updates: Iterable[bytes] = ()) -> None:
+        if pycrdt is None:
+            raise RuntimeError("pycrdt is required for server-side Y.js documents")
+        self.doc = pycrdt.Doc()
+        self._text = self.doc.get(TEXT_NAME, type=pycrdt.Text)
+        for update in updates:
+            self.doc.apply_update(update)
+
+    def apply_update(self, update: bytes) -> None:
+        """Merge an update from a client or another worker"""
+        self.doc.apply_update(update)
+
+    def seed_text(self, document_id: str, content: str) -> bytes:
+        """Fill an empty document with plain text; returns the update.
+
+        The seed is written under a client ID derived from the document and
+        its text, so seeds built independently by several workers are the
+        same Y.js item and merge into one instead of duplicating the text.
+        """
+        assert pycrdt is not None
+        digest = hashlib.sha256(f"{document_id}\n{content}".encode("utf-8")).digest()
+        seed = pycrdt.Doc(client_id=int.from_bytes(digest[:4], "big"))
+        seed.get(TEXT_NAME, type=pycrdt.Text).insert(0, content)
+        update = seed.get_update()
+        self.doc.apply_update(update)
+        return update
+
+    def state_vector(self) -> bytes:
+        """Get the state vector, used by clients to send what the server lacks"""
+        return self.doc.get_state()
+
+    def diff(self, state_vector: Optional[bytes] = None) -> bytes:
+        """Get the updates missing from a peer with the given state vector"""
+        return self.doc.get_update(state_vector)
+
+    @property
+    def is_empty(self) -> bool:
+        """Check if no update has been merged yet"""
+        return self.doc.get_state() == EMPTY_STATE_VECTOR
+
+    def text(self) -> str:
+        """Get the plain text of the script"""
+        return str(self._text)
@@ -2,10 +2,12 @@
 Document service for business logic
 """
 
-from typing import Optional, List
+import base64
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
+from app.core.pagination import encode_cursor
 from app.db.repositories.document_repository import (
     DocumentRepository,
     DocumentHistoryRepository,
@@ -13,9 +15,43 @@ from app.db.repositories.document_repository import (
 from app.schemas.document import (
     DocumentCreate,
     DocumentUpdate,
+    DocumentSummary,
 )
 from app.models.document import Document, DocumentCollaborator
 from app.models.user import User
+from app.services.crdt_service import RoomDocument
+
+if TYPE_CHECKING:
+    from app.services.persistence_service import PendingChanges
+
+
+def to_summary(row: Any) -> DocumentSummary:
+    """Build a DocumentSummary from a summary row"""
+    return DocumentSummary(
+        id=str(row.id),
+        title=str(row.title),
+        owner_id=int(row.owner_id),
+        is_public=bool(row.is_public),
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+        collaborator_count=row.collaborator_count,
+    )
+
+
+def to_summary_page(
+    rows: Sequence[Any], limit: Optional[int]
+) -> Tuple[List[DocumentSummary], Optional[str]]:
+    """Build a page from up to limit + 1 summary rows.
+
+    Returns the summaries and the cursor of the next page, or None on the
+    last page.
+    """
+    if limit is None or len(rows) <= limit:
+        return [to_summary(row) for row in rows], None
+    rows = rows[:limit]
+    return [to_summary(row) for row in rows], encode_cursor(
+        rows[-1].updated_at, rows[-1].id
+    )
 
 
 class DocumentService:
@@ -92,32 +128,66 @@ class DocumentService:
 
         return updated_document
 
-    def update_document_content(
-        self,
-        document_id: str,
-        content: str,
-        user: User,
-        yjs_update: Optional[str] = None,
-    ) -> Optional[Document]:
-        """Update document content (for real-time collaboration)"""
-        # Check permissions
-        permission = self.document_repo.check_user_permission(document_id, int(user.id))
-        if permission not in ["edit", "admin"]:
-            return None
+    def save_realtime_changes(self, changes: Dict[str, "PendingChanges"]) -> None:
+        """Save buffered real-time changes of many documents in one transaction.
 
-        # Update content
-        document = self.document_repo.update_content(document_id, content)
+        Edit permission was checked when the WebSocket connection was opened;
+        changes of documents deleted in the meantime are dropped. A document
+        with new content costs a single UPDATE, which also tells whether it
+        still exists.
+        """
+        without_content = [
+            document_id
+            for document_id, pending in changes.items()
+            if pending.content is None
+        ]
+        existing_ids = (
+            self.document_repo.get_existing_ids(without_content)
+            if without_content
+            else set()
+        )
+        for document_id, pending in changes.items():
+            if pending.content is not None:
+                exists = (
+                    self.document_repo.set_content(document_id, pending.content)
+                    is not None
+                )
+            else:
+                exists = document_id in existing_ids
+            if exists and pending.updates:
+                self.history_repo.add_yjs_updates(document_id, pending.updates)
+        self.db.commit()
 
-        if document and yjs_update:
-            # Create history entry for Y.js update
-            self.history_repo.create_history_entry(
-                document_id=document_id,
-                user_id=int(user.id),
-                operation_type="yjs_update",
-                yjs_update=yjs_update,
-            )
+    def get_yjs_updates(self, document_id: str) -> List[bytes]:
+        """Get the stored Y.js updates of a document, oldest first"""
+        return [
+            base64.b64decode(update)
+            for update in self.history_repo.get_yjs_updates(document_id)
+        ]
 
-        return document
+    def compact_history(self, document_id: str, keep_checkpoints: int) -> bool:
+        """Merge the Y.js updates since the last checkpoint into a new one"""
+        checkpoint_update, after_id = self.history_repo.get_checkpoint_base(document_id)
+        updates: List[bytes] = []
+        if checkpoint_update:
+            updates.append(base64.b64decode(checkpoint_update))
+
+        rows = self.history_repo.get_yjs_update_rows(document_id, after_id)
+        owner_id = self.document_repo.get_owner_id(document_id)
+        if not rows or owner_id is None:
+            return False
+
+        updates.extend(base64.b64decode(update) for _, update in rows)
+        room = RoomDocument(updates)
+        self.history_repo.create_checkpoint(
+            document_id=document_id,
+            user_id=owner_id,
+            merged_update=base64.b64encode(room.diff()).decode("ascii"),
+            content_snapshot=room.text(),
+            up_to_id=rows[-1][0],
+            keep_checkpoints=keep_checkpoints,
+        )
+        return True
 
     def delete_document(self, document_id: str, user: User) -> bool:
         """Delete document"""
@@ -189,3 +259,9 @@ class DocumentService:
     def check_user_permission(self, document_id: str, user: User) -> Optional[str]:
         """Check user permission for document"""
         return self.document_repo.check_user_permission(document_id, int(user.id))
+
+    def check_user_permissions(
+        self, document_ids: List[str], user: User
+    ) -> Dict[str, Optional[str]]:
+        """Check user permission for many documents at once"""
+        return self.document_repo.check_user_permissions(document_ids, int(user.id))
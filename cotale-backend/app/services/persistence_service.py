@@ -0,0 +1,162 @@
+"""
+Write-behind persistence for real-time document changes
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.services.document_service import DocumentService
+
+logger = logging.getLogger(__name__)
+
+
+class PendingChanges:
+    """Changes of one document waiting to be written"""
+
+    __slots__ = ("content", "updates")
+
+    def __init__(self) -> None:
+        self.content: Optional[str] = None  # latest content, if it changed
+        self.updates: List[Tuple[int, str]] = []  # (user_id, base64 Y.js update)
+
+
+class WriteBehindBuffer:
+    """Buffers real-time changes per document and writes them in batches.
+
+    Changes are flushed every interval, or as soon as a document has
+    max_pending Y.js updates waiting. Each flush writes all buffered
+    documents in a single transaction, off the event loop. A batch that
+    fails to write is buffered again and retried by the next flush.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval_seconds: float,
+        max_pending: int,
+        content_provider: Optional[Callable[[str], Optional[str]]] = None,
+    ) -> None:
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.max_pending = max_pending
+        # Supplies the current text of a document at flush time, if known;
+        # it is written instead of content buffered with the changes
+        self.content_provider = content_provider
+        self._pending: Dict[str, PendingChanges] = {}
+        self._writing: Dict[str, PendingChanges] = {}  # batch being written
+        self._lock = asyncio.Lock()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def add_update(
+        self,
+        document_id: str,
+        user_id: int,
+        yjs_update: str,
+        content: Optional[str] = None,
+    ) -> None:
+        """Buffer a Y.js update, optionally with the resulting content"""
+        pending = self._pending.setdefault(document_id, PendingChanges())
+        pending.updates.append((user_id, yjs_update))
+        if content is not None:
+            pending.content = content
+        if len(pending.updates) >= self.max_pending:
+            self.schedule_flush(document_id)
+
+    def set_content(self, document_id: str, content: str) -> None:
+        """Buffer a direct content change; only the latest one is written"""
+        self._pending.setdefault(document_id, PendingChanges()).content = content
+
+    def provide_content(self, document_id: str, content: str) -> None:
+        """Write the server's text of a document instead of buffered content"""
+        pending = self._pending.get(document_id)
+        if pending is not None:
+            pending.content = content
+
+    def pending_updates(self, document_id: str) -> List[str]:
+        """Get the unwritten Y.js updates of a document, oldest first"""
+        updates: List[str] = []
+        for changes in (self._writing, self._pending):
+            pending = changes.get(document_id)
+            if pending is not None:
+                updates.extend(update for _, update in pending.updates)
+        return updates
+
+    def has_pending(self, document_id: str) -> bool:
+        """Check if a document has unwritten changes"""
+        return document_id in self._pending
+
+    def schedule_flush(self, document_id: Optional[str] = None) -> None:
+        """Flush one document (or all) in the background"""
+        asyncio.create_task(self._flush_logged(document_id))
+
+    async def flush(self, document_id: Optional[str] = None) -> None:
+        """Write pending changes of one document, or of all documents"""
+        async with self._lock:
+            if document_id is None:
+                batch, self._pending = self._pending, {}
+            elif document_id in self._pending:
+                batch = {document_id: self._pending.pop(document_id)}
+            else:
+                return
+            if not batch:
+                return
+
+            # Read in-memory document text on the event loop, not the thread;
+            # it replaces any content sent by clients
+            if self.content_provider is not None:
+                for batch_document_id, pending in batch.items():
+                    content = self.content_provider(batch_document_id)
+                    if content is not None:
+                        pending.content = content
+
+            self._writing = batch
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                self._requeue(batch)
+                raise
+            finally:
+                self._writing = {}
+
+    def _requeue(self, batch: Dict[str, PendingChanges]) -> None:
+        """Buffer a failed batch again, before changes made since"""
+        for document_id, failed in batch.items():
+            newer = self._pending.get(document_id)
+            if newer is not None:
+                failed.updates.extend(newer.updates)
+                if newer.content is not None:
+                    failed.content = newer.content
+            self._pending[document_id] = failed
+
+    def _write(self, batch: Dict[str, PendingChanges]) -> None:
+        db = self.session_factory()
+        try:
+            DocumentService(db).save_realtime_changes(batch)
+        finally:
+            db.close()
+
+    async def _flush_logged(self, document_id: Optional[str] = None) -> None:
+        try:
+            await self.flush(document_id)
+        except Exception:
+            # The failed batch is buffered again and retried next time
+            logger.exception("Failed to write buffered document changes")
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            await self._flush_logged()
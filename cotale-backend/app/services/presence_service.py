@@ -0,0 +1,65 @@
+"""
+Presence service for coalescing cursor updates
+"""
+
+import asyncio
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+
+def merge_cursor_batches(older: str, newer: str) -> str:
+    """Merge two cursor_batch frames, keeping the newest cursor per user"""
+    batch = json.loads(older)
+    cursors = {cursor["user_id"]: cursor for cursor in batch["cursors"]}
+    for cursor in json.loads(newer)["cursors"]:
+        cursors[cursor["user_id"]] = cursor
+    batch["cursors"] = list(cursors.values())
+    return json.dumps(batch, separators=(",", ":"))
+
+
+class PresenceAggregator:
+    """Latest cursor per user in one document, flushed once per tick.
+
+    Cursor moves only overwrite the pending entry for their user; a single
+    batched frame is emitted per tick instead of one frame per move.
+    """
+
+    def __init__(
+        self,
+        document_id: str,
+        tick_seconds: float,
+        flush_callback: Callable[[str, List[Dict[str, Any]]], None],
+    ) -> None:
+        self.document_id = document_id
+        self.tick_seconds = tick_seconds
+        self.flush_callback = flush_callback
+        self.pending: Dict[str, Dict[str, Any]] = {}  # user_id -> latest cursor
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def update(self, user_id: str, cursor: Dict[str, Any]) -> None:
+        """Record the latest cursor of a user and schedule a flush"""
+        self.pending[user_id] = cursor
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_after_tick())
+
+    def discard(self, user_id: str) -> None:
+        """Drop a pending cursor, e.g. when its user leaves"""
+        self.pending.pop(user_id, None)
+
+    def flush(self) -> None:
+        """Emit all pending cursors as one batch"""
+        if not self.pending:
+            return
+        cursors = list(self.pending.values())
+        self.pending = {}
+        self.flush_callback(self.document_id, cursors)
+
+    def close(self) -> None:
+        """Cancel the scheduled flush and drop pending cursors"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self.pending = {}
+
+    async def _flush_after_tick(self) -> None:
+        await asyncio.sleep(self.tick_seconds)
+        self.flush()
@@ -2,161 +2,737 @@
 WebSocket service for real-time collaboration
 """
 
+import asyncio
+import base64
 import json
-from typing import Dict, List, Optional
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
 from fastapi import WebSocket
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.security import permission_cache
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.db.repositories.async_document_repository import AsyncDocumentRepository
 from app.models.user import User
-from app.services.document_service import DocumentService
+from app.services.backplane import (
+    Backplane,
+    InMemoryBackplane,
+    decode_envelope,
+    encode_envelope,
+)
+from app.services.connection_registry import (
+    FRAME_KIND_CURSOR,
+    FRAME_KIND_YJS,
+    Connection,
+    ConnectionRegistry,
+    ConnectionWriter,
+)
+from app.services.async_document_service import AsyncDocumentService
+from app.services.crdt_service import HAS_CRDT, RoomDocument
+from app.services.persistence_service import WriteBehindBuffer
+from app.services.presence_service import PresenceAggregator
+from app.services.ws_protocol import (
+    FRAME_SYNC_STEP1,
+    FRAME_SYNC_STEP2,
+    FRAME_YJS_UPDATE,
+    Frame,
+    decode_binary_frame,
+    encode_binary_frame,
+    extract_yjs_update,
+)
+
+
+def encode_frame(message: Dict[str, Any]) -> str:
+    """Serialize a message once so it can be queued for many connections"""
+    return json.dumps(message, separators=(",", ":"))
+
+
+# Workers re-announce their presence every heartbeat interval; presence of a
+# worker that missed this many announcements (e.g. it crashed) is dropped
+PRESENCE_TTL_INTERVALS = 3
+
+# How long a last message before closing may take to reach a client
+FINAL_MESSAGE_TIMEOUT_SECONDS = 1.0
 
 
 class WebSocketService:
-    def __init__(self) -> None:
-        self.active_connections: Dict[str, List[Dict]] = (
+    def __init__(
+        self,
+        backplane: Optional[Backplane] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        async_session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    ) -> None:
+        self.registry = ConnectionRegistry()
+        self.presence: Dict[str, PresenceAggregator] = (
+            {}
+        )  # document_id -> pending cursor updates
+        self.backplane = backplane or InMemoryBackplane()
+        self.node_id = uuid.uuid4().hex
+        self.session_factory = session_factory  # write-behind flushes
+        self.async_session_factory = async_session_factory  # handshakes
+        self.remote_presence: Dict[str, Dict[str, Dict[str, Any]]] = (
             {}
-        )  # document_id -> list of connection info
-        self.document_users: Dict[str, Dict[str, Dict]] = (
+        )  # document_id -> node_id -> {"users", "connections", "seen"}
+        self.rooms: Dict[str, RoomDocument] = (
             {}
-        )  # document_id -> user_id -> user info
+        )  # document_id -> server-side Y.js document
+        self.persistence = WriteBehindBuffer(
+            session_factory,
+            settings.WS_PERSIST_INTERVAL_MS / 1000,
+            settings.WS_PERSIST_MAX_PENDING,
+            content_provider=self._get_room_text,
+        )
+        self.admitting: Dict[str, Dict[str, int]] = (
+            {}
+        )  # document_id -> admission -> handshakes in progress
+        self._admitting_count = 0
+        self._heartbeat_task: Optional["asyncio.Task[None]"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        """Start relaying broadcasts, heartbeats and writing buffered changes"""
+        self._loop = asyncio.get_running_loop()
+        await self.backplane.start(self._handle_backplane_message)
+        self.persistence.start()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_periodically())
+        permission_cache.add_listener(self._permissions_changed)
+
+    async def stop(self) -> None:
+        """Stop relaying broadcasts and write all pending changes"""
+        permission_cache.remove_listener(self._permissions_changed)
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+        await self.backplane.stop()
+        await self.persistence.stop()
 
     async def connect(
         self,
         websocket: WebSocket,
         document_id: str,
         user: User,
-        db: Session,
     ) -> bool:
-        """Connect a user to a document with permission check"""
-        # Check document permissions
-        document_service = DocumentService(db)
-        permission = document_service.check_user_permission(document_id, user)
-
-        if not permission:
+        """Connect a user to a document with permission check.
+
+        The handshake runs on its own short-lived async session, closed
+        before the socket is accepted, so open sockets hold no pooled
+        connection and other sockets keep being served during the queries.
+        The admitted seat is reserved until the connection is registered,
+        so concurrent handshakes cannot overshoot the limits.
+        """
+        # Admission control: full rooms get spectators, a full worker rejects
+        admission = self.admit(document_id)
+        if admission is None:
+            await websocket.accept()
+            retry_after = settings.WS_RETRY_AFTER_SECONDS
             await websocket.close(
-                code=4003, reason="No permission to access this document"
+                code=1013, reason=f"Server busy, retry after {retry_after}s"
             )
             return False
 
-        # Check if document exists
-        document = document_service.get_document(document_id, user)
-        if not document:
-            await websocket.close(code=4004, reason="Document not found")
-            return False
+        self._reserve(document_id, admission)
+        accepted = False
+        try:
+            async with self.async_session_factory() as db:
+                # Check document permissions
+                document_service = AsyncDocumentService(db)
+                permission = await document_service.check_user_permission(
+                    document_id, user
+                )
 
-        await websocket.accept()
+                # Check if document exists
+                document = None
+                if permission:
+                    document = await document_service.get_document(
+                        document_id, with_relations=False
+                    )
 
-        # Initialize document connections if not exists
-        if document_id not in self.active_connections:
-            self.active_connections[document_id] = []
-            self.document_users[document_id] = {}
+                # Load the server-side Y.js document when the room opens here
+                if document and HAS_CRDT and document_id not in self.rooms:
+                    await self._load_room(
+                        document_id,
+                        document_service,
+                        str(document.content or ""),
+                        user,
+                    )
 
-        # Add connection info
-        connection_info = {
-            "websocket": websocket,
-            "user_id": str(user.id),
-            "user_name": user.username,
-            "permission": permission,
-        }
-        self.active_connections[document_id].append(connection_info)
+            if not permission:
+                await websocket.close(
+                    code=4003, reason="No permission to access this document"
+                )
+                return False
+            if not document:
+                await websocket.close(code=4004, reason="Document not found")
+                return False
+
+            await websocket.accept()
+            accepted = True
+        finally:
+            # Registered below without awaiting, so the seat is never free
+            self._release(document_id, admission)
+            if not accepted:
+                # Release a room loaded for this handshake alone
+                self._close_room(document_id)
+                if self.persistence.has_pending(document_id):
+                    self.persistence.schedule_flush(document_id)
+
+        spectator = admission == "spectator"
+        if spectator:
+            permission = "view"
+        room = self.rooms.get(document_id)
+
+        # Ask other workers for their presence when the room opens here
+        if document_id not in self.registry:
+            self._publish({"kind": "presence_request", "document_id": document_id})
+
+        # Register connection with the user and permission resolved once
+        connection = Connection(
+            websocket=websocket,
+            document_id=document_id,
+            user_id=str(user.id),
+            user_name=user.username,
+            email=user.email,
+            permission=permission,
+            writer=ConnectionWriter(
+                websocket,
+                settings.WS_SEND_QUEUE_SIZE,
+                settings.WS_SEND_BUFFER_BYTES,
+                settings.WS_SEND_HIGH_WATER_BYTES,
+                settings.WS_SLOW_CONSUMER_POLICY,
+            ),
+            spectator=spectator,
+        )
+        self.registry.add(connection)
+        connection.writer.start(lambda: self._remove_connection(connection))
+        self._publish_presence(document_id)
+        users = self.get_document_users(document_id)
+
+        # Broadcast user joined (spectators join silently)
+        if not spectator:
+            self.broadcast_frame(
+                document_id,
+                encode_frame(
+                    {
+                        "type": "user_joined",
+                        "user_id": connection.user_id,
+                        "user_name": connection.user_name,
+                        "permission": permission,
+                        "users": users,
+                    }
+                ),
+                exclude_user_id=connection.user_id,
+            )
 
-        # Add user info
-        self.document_users[document_id][str(user.id)] = {
-            "user_name": user.username,
-            "permission": permission,
-            "email": user.email,
+        # Send current document state to new user. With a server-side Y.js
+        # document the client syncs by state vector instead of full content.
+        document_state = {
+            "type": "document_state",
+            "document_id": document_id,
+            "title": str(document.title),
+            "users": users,
+            "your_permission": permission,
+            "spectator": spectator,
+            "yjs_sync": room is not None,
         }
+        if room is None or room.is_empty:
+            document_state["content"] = str(document.content)
+        self.send_frame(websocket, document_id, encode_frame(document_state))
+
+        # Ask the client for the updates the server is missing
+        if room is not None:
+            self.send_frame(
+                websocket,
+                document_id,
+                encode_binary_frame(FRAME_SYNC_STEP1, room.state_vector()),
+            )
 
-        # Broadcast user joined
-        await self.broadcast_to_document(
-            document_id,
-            {
-                "type": "user_joined",
-                "user_id": str(user.id),
-                "user_name": user.username,
-                "permission": permission,
-                "users": self.document_users[document_id],
-            },
-            exclude_user_id=str(user.id),
-        )
+        return True
 
-        # Send current document state to new user
-        await websocket.send_text(
-            json.dumps(
-                {
-                    "type": "document_state",
-                    "document_id": document_id,
-                    "title": str(document.title),
-                    "content": str(document.content),
-                    "users": self.document_users[document_id],
-                    "your_permission": permission,
-                }
+    def admit(self, document_id: str) -> Optional[str]:
+        """Decide how a new connection to a document is admitted.
+
+        Returns "participant", "spectator" when the room is full, or None
+        when the worker or the room's spectator seats are full.
+        """
+        if len(self.registry) + self._admitting_count >= settings.WS_MAX_CONNECTIONS:
+            return None
+        admitting = self.admitting.get(document_id, {})
+        spectators = self.registry.spectator_count(document_id)
+        participants = self.registry.count(document_id) - spectators
+        spectators += admitting.get("spectator", 0)
+        participants += admitting.get("participant", 0)
+        if participants < settings.WS_MAX_ROOM_CONNECTIONS:
+            return "participant"
+        if spectators < settings.WS_MAX_ROOM_SPECTATORS:
+            return "spectator"
+        return None
+
+    def _reserve(self, document_id: str, admission: str) -> None:
+        """Hold an admitted seat while the handshake runs"""
+        admitting = self.admitting.setdefault(document_id, {})
+        admitting[admission] = admitting.get(admission, 0) + 1
+        self._admitting_count += 1
+
+    def _release(self, document_id: str, admission: str) -> None:
+        """Give back a seat held by _reserve"""
+        admitting = self.admitting[document_id]
+        admitting[admission] -= 1
+        if not admitting[admission]:
+            del admitting[admission]
+        if not admitting:
+            del self.admitting[document_id]
+        self._admitting_count -= 1
+
+    def get_occupancy(self) -> Dict[str, Any]:
+        """Get the connection load of this worker, for load balancers"""
+        connections = len(self.registry) + self._admitting_count
+        return {
+            "connections": connections,
+            "max_connections": settings.WS_MAX_CONNECTIONS,
+            "spectators": self.registry.spectator_count(),
+            "documents": self.registry.document_count(),
+            "accepting": connections < settings.WS_MAX_CONNECTIONS,
+        }
+
+    async def _load_room(
+        self,
+        document_id: str,
+        document_service: AsyncDocumentService,
+        content: str,
+        user: User,
+    ) -> None:
+        """Rebuild the Y.js document of a room from its stored and buffered updates.
+
+        A document with content but no Y.js history is seeded with its
+        content, so every joiner syncs the same text instead of inserting
+        it again. The seed is stored like any other update. Workers that
+        already have the room send the updates not written yet.
+        """
+        try:
+            updates = await document_service.get_yjs_updates(document_id)
+            # Updates still buffered for the write-behind flush come last
+            updates.extend(
+                base64.b64decode(update)
+                for update in self.persistence.pending_updates(document_id)
             )
+            room = RoomDocument(updates)
+        except Exception:
+            # Unreadable history: relay updates without a server-side document
+            return
+        # Another connection may have opened the room during the query
+        if document_id in self.rooms:
+            return
+        self.rooms[document_id] = room
+        if room.is_empty and content:
+            seed = room.seed_text(document_id, content)
+            self.persistence.add_update(
+                document_id, int(user.id), base64.b64encode(seed).decode("ascii")
+            )
+        self._publish(
+            {"kind": "room_sync_request", "document_id": document_id},
+            room.state_vector(),
         )
 
+    def _get_room_text(self, document_id: str) -> Optional[str]:
+        """Get the text of the room document, if the room is loaded"""
+        room = self.rooms.get(document_id)
+        return room.text() if room is not None else None
+
+    def _apply_room_update(self, document_id: str, update: bytes) -> bool:
+        """Merge an update into the room document; False if it is invalid"""
+        room = self.rooms.get(document_id)
+        if room is None:
+            return True
+        try:
+            room.apply_update(update)
+        except Exception:
+            return False
         return True
 
     def disconnect(self, websocket: WebSocket, document_id: str, user_id: str) -> None:
         """Disconnect a user from a document"""
-        if document_id in self.active_connections:
-            # Remove connection
-            self.active_connections[document_id] = [
-                conn
-                for conn in self.active_connections[document_id]
-                if conn["websocket"] != websocket
-            ]
-
-            # Remove user
-            if user_id in self.document_users.get(document_id, {}):
-                user_name = self.document_users[document_id][user_id]["user_name"]
-                del self.document_users[document_id][user_id]
-
-                # Broadcast user left
-                if self.active_connections[document_id]:
-                    import asyncio
-
-                    asyncio.create_task(
-                        self.broadcast_to_document(
-                            document_id,
-                            {
-                                "type": "user_left",
-                                "user_id": user_id,
-                                "user_name": user_name,
-                                "users": self.document_users[document_id],
-                            },
-                        )
-                    )
+        connection = self.registry.get(websocket)
+        if connection is not None:
+            self._remove_connection(connection)
+
+    def touch(self, websocket: WebSocket) -> None:
+        """Record that the client of a connection is alive"""
+        connection = self.registry.get(websocket)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
+    def reap_idle_connections(self) -> int:
+        """Ping quiet connections and evict those that missed too many pings.
+
+        Returns the number of evicted connections.
+        """
+        interval = settings.WS_HEARTBEAT_INTERVAL
+        deadline = interval * settings.WS_HEARTBEAT_MAX_MISSED
+        ping = encode_frame({"type": "ping"})
+        now = time.monotonic()
+        evicted = 0
+        for connection in self.registry:
+            idle = now - connection.last_seen
+            if idle >= deadline:
+                self._evict(connection, 4008, "Heartbeat timeout")
+                evicted += 1
+            elif idle >= interval and not connection.writer.enqueue(ping):
+                self._drop_connection(connection)
+        return evicted
+
+    def _evict(self, connection: Connection, code: int, reason: str) -> None:
+        """Unregister a connection now and close its socket in the background"""
+        self._remove_connection(connection)
+        asyncio.create_task(self._close_socket(connection.websocket, code, reason))
+
+    def _drop_connection(self, connection: Connection) -> None:
+        """Drop a connection whose writer rejected a frame"""
+        if connection.writer.overflowed:
+            # Queued frames are lost; the client resyncs when it reconnects
+            self._evict(connection, 4009, "Slow consumer, resync required")
+        else:
+            self._remove_connection(connection)
+
+    async def _close_socket(self, websocket: WebSocket, code: int, reason: str):
+        """Close a socket that may already be gone"""
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def _permissions_changed(self, document_id: str, user_id: Optional[int]) -> None:
+        """Permission cache listener; may be called from any thread"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(
+                self._on_permissions_changed, document_id, user_id
+            )
 
-            # Clean up empty document
-            if not self.active_connections[document_id]:
-                del self.active_connections[document_id]
-                if document_id in self.document_users:
-                    del self.document_users[document_id]
+    def _on_permissions_changed(self, document_id: str, user_id: Optional[int]) -> None:
+        """Tell other workers about a permission change and apply it here"""
+        self._publish(
+            {"kind": "permissions", "document_id": document_id, "user_id": user_id}
+        )
+        if document_id in self.registry:
+            asyncio.create_task(self.refresh_permissions(document_id, user_id))
+
+    async def refresh_permissions(
+        self, document_id: str, user_id: Optional[int] = None
+    ) -> None:
+        """Re-resolve the permissions of live connections to a document.
+
+        Connections keep their socket: their role is updated in place and
+        the client is told, while those that lost access are closed.
+        """
+        user_ids = {
+            connection.user_id
+            for connection in self.registry.connections(document_id)
+            if user_id is None or connection.user_id == str(user_id)
+        }
+        if not user_ids:
+            return
+
+        async with self.async_session_factory() as db:
+            document_repo = AsyncDocumentRepository(db)
+            permissions = {
+                connection_user_id: await document_repo.check_user_permission(
+                    document_id, int(connection_user_id)
+                )
+                for connection_user_id in user_ids
+            }
+
+        for connection in list(self.registry.connections(document_id)):
+            if connection.user_id not in permissions:
+                continue
+            permission = permissions[connection.user_id]
+            if permission is None:
+                self._evict(connection, 4003, "No permission to access this document")
+                continue
+            if connection.spectator:
+                # Spectators stay read-only whatever their role
+                continue
+            if permission != connection.permission:
+                self.registry.set_permission(connection, permission)
+                self.send_personal_message(
+                    connection.websocket,
+                    document_id,
+                    {"type": "permission_changed", "permission": permission},
+                )
+
+    async def _heartbeat_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+            self.reap_idle_connections()
+            for document_id in self.registry.document_ids():
+                self._publish_presence(document_id)
+            self.expire_remote_presence()
+
+    def expire_remote_presence(self) -> int:
+        """Forget presence of workers that stopped re-announcing it"""
+        deadline = time.monotonic() - (
+            settings.WS_HEARTBEAT_INTERVAL * PRESENCE_TTL_INTERVALS
+        )
+        expired = 0
+        for document_id, nodes in list(self.remote_presence.items()):
+            for node_id, node in list(nodes.items()):
+                if node["seen"] < deadline:
+                    del nodes[node_id]
+                    expired += 1
+            if not nodes:
+                del self.remote_presence[document_id]
+        return expired
 
     async def broadcast_to_document(
         self,
         document_id: str,
         message: dict,
         exclude_user_id: Optional[str] = None,
+        exclude_websocket: Optional[WebSocket] = None,
     ):
         """Broadcast a message to all users in a document"""
-        if document_id in self.active_connections:
-            disconnected = []
-            for connection_info in self.active_connections[document_id]:
-                if connection_info["user_id"] != exclude_user_id:
-                    try:
-                        await connection_info["websocket"].send_text(
-                            json.dumps(message)
-                        )
-                    except Exception:
-                        disconnected.append(connection_info)
-
-            # Remove disconnected connections
-            for conn_info in disconnected:
-                self.active_connections[document_id].remove(conn_info)
-                user_id = conn_info["user_id"]
-                if user_id in self.document_users.get(document_id, {}):
-                    del self.document_users[document_id][user_id]
+        self.broadcast_frame(
+            document_id,
+            encode_frame(message),
+            exclude_user_id=exclude_user_id,
+            exclude_websocket=exclude_websocket,
+        )
+
+    def broadcast_frame(
+        self,
+        document_id: str,
+        frame: Frame,
+        exclude_user_id: Optional[str] = None,
+        exclude_websocket: Optional[WebSocket] = None,
+        yjs_update: bool = False,
+        spectators: bool = True,
+        frame_kind: Optional[str] = None,
+    ) -> None:
+        """Queue an already serialized frame for all users in a document.
+
+        yjs_update marks frames carrying a Y.js update, so other workers
+        merge it into their own room document as well. Frames sent with
+        spectators=False skip spectator connections. frame_kind lets lagging
+        connections coalesce the frame with queued ones of the same kind.
+        """
+        if yjs_update:
+            frame_kind = FRAME_KIND_YJS
+        self._deliver_frame(
+            document_id,
+            frame,
+            exclude_user_id,
+            exclude_websocket,
+            spectators,
+            frame_kind,
+        )
+        if self.backplane.is_active:
+            header = {
+                "kind": "frame",
+                "document_id": document_id,
+                "exclude_user_id": exclude_user_id,
+                "binary": isinstance(frame, bytes),
+                "yjs_update": yjs_update,
+                "spectators": spectators,
+                "frame_kind": frame_kind,
+            }
+            payload = frame if isinstance(frame, bytes) else frame.encode("utf-8")
+            self._publish(header, payload)
+
+    def _deliver_frame(
+        self,
+        document_id: str,
+        frame: Frame,
+        exclude_user_id: Optional[str] = None,
+        exclude_websocket: Optional[WebSocket] = None,
+        spectators: bool = True,
+        frame_kind: Optional[str] = None,
+    ) -> None:
+        """Queue a frame for the connections of this worker only"""
+        disconnected = []
+        for connection in self.registry.connections(document_id):
+            if connection.user_id == exclude_user_id:
+                continue
+            if connection.spectator and not spectators:
+                continue
+            if connection.websocket is exclude_websocket:
+                continue
+            if not connection.writer.enqueue(frame, frame_kind):
+                disconnected.append(connection)
+
+        # Remove disconnected and overflowing connections
+        for connection in disconnected:
+            self._drop_connection(connection)
+
+    def send_personal_message(
+        self, websocket: WebSocket, document_id: str, message: dict
+    ) -> None:
+        """Queue a message for a single connection"""
+        self.send_frame(websocket, document_id, encode_frame(message))
+
+    async def send_final_message(
+        self, websocket: WebSocket, document_id: str, message: dict
+    ) -> None:
+        """Queue a message for a connection about to close and let it drain"""
+        self.send_personal_message(websocket, document_id, message)
+        connection = self.registry.get(websocket)
+        if connection is not None:
+            await connection.writer.drain(FINAL_MESSAGE_TIMEOUT_SECONDS)
+
+    def send_frame(self, websocket: WebSocket, document_id: str, frame: Frame) -> None:
+        """Queue an already serialized frame for a single connection"""
+        connection = self.registry.get(websocket)
+        if connection is None:
+            return
+        if not connection.writer.enqueue(frame):
+            self._drop_connection(connection)
+
+    def _get_editor(self, websocket: WebSocket) -> Optional[Connection]:
+        """Get the connection if it may edit, replying with an error otherwise"""
+        connection = self.registry.get(websocket)
+        if connection is None:
+            return None
+
+        if not connection.can_edit:
+            self.send_personal_message(
+                websocket,
+                connection.document_id,
+                {"type": "error", "message": "No permission to edit this document"},
+            )
+            return None
+        return connection
+
+    def _remove_connection(self, connection: Connection) -> None:
+        """Unregister a connection and release its room state when unused"""
+        connection.writer.stop()
+        if self.registry.remove(connection.websocket) is None:
+            return
+        document_id = connection.document_id
+        user_id = connection.user_id
+        self._publish_presence(document_id)
+
+        # Spectators and other tabs of the same user leave no presence gap
+        if not connection.spectator and not self.registry.has_user(
+            document_id, user_id
+        ):
+            # Drop pending cursor
+            if document_id in self.presence:
+                self.presence[document_id].discard(user_id)
+
+            # Broadcast user left (also to users on other workers)
+            self.broadcast_frame(
+                document_id,
+                encode_frame(
+                    {
+                        "type": "user_left",
+                        "user_id": user_id,
+                        "user_name": connection.user_name,
+                        "users": self.get_document_users(document_id),
+                    }
+                ),
+            )
+
+        # Clean up empty document
+        self._close_room(document_id)
+
+        # Write what the leaving user left pending
+        if self.persistence.has_pending(document_id):
+            self.persistence.schedule_flush(document_id)
+
+    def _close_room(self, document_id: str) -> None:
+        """Release the room state of a document nobody uses or is joining"""
+        if document_id in self.registry or document_id in self.admitting:
+            return
+        if document_id in self.presence:
+            self.presence.pop(document_id).close()
+        room = self.rooms.pop(document_id, None)
+        if room is not None:
+            self.persistence.provide_content(document_id, room.text())
+
+    def _publish(self, header: Dict[str, Any], payload: bytes = b"") -> None:
+        """Publish a message for the other workers"""
+        if self.backplane.is_active:
+            self.backplane.publish(
+                encode_envelope({**header, "origin": self.node_id}, payload)
+            )
+
+    def _publish_presence(self, document_id: str) -> None:
+        """Publish the users connected to a document through this worker"""
+        self._publish(
+            {
+                "kind": "presence",
+                "document_id": document_id,
+                "users": self.registry.users(document_id),
+                "connections": self.registry.count(document_id),
+            }
+        )
+
+    async def _handle_backplane_message(self, data: bytes) -> None:
+        """Apply a message published by another worker"""
+        header, payload = decode_envelope(data)
+        origin = header["origin"]
+        if origin == self.node_id:
+            return
+
+        document_id = header["document_id"]
+        kind = header["kind"]
+        if kind == "frame":
+            frame: Frame = payload if header["binary"] else payload.decode("utf-8")
+            if header["yjs_update"] and document_id in self.rooms:
+                update = extract_yjs_update(frame)
+                if update:
+                    self._apply_room_update(document_id, update)
+            self._deliver_frame(
+                document_id,
+                frame,
+                header["exclude_user_id"],
+                spectators=header.get("spectators", True),
+                frame_kind=header.get("frame_kind"),
+            )
+        elif kind == "presence":
+            nodes = self.remote_presence.setdefault(document_id, {})
+            if header["connections"]:
+                nodes[origin] = {
+                    "users": header["users"],
+                    "connections": header["connections"],
+                    "seen": time.monotonic(),
+                }
+            else:
+                nodes.pop(origin, None)
+                if not nodes:
+                    del self.remote_presence[document_id]
+        elif kind == "presence_request":
+            if document_id in self.registry:
+                self._publish_presence(document_id)
+        elif kind == "room_sync_request":
+            # Send a room opening on another worker what it is missing
+            room = self.rooms.get(document_id)
+            if room is not None:
+                try:
+                    diff = room.diff(payload)
+                except Exception:
+                    return
+                self._publish(
+                    {"kind": "room_sync", "document_id": document_id, "to": origin},
+                    diff,
+                )
+        elif kind == "room_sync":
+            room = self.rooms.get(document_id)
+            if header["to"] == self.node_id and room is not None:
+                state_vector = room.state_vector()
+                if not self._apply_room_update(document_id, payload):
+                    return
+                # Pass updates this worker lacked on to its clients
+                if room.state_vector() != state_vector:
+                    self._deliver_frame(
+                        document_id,
+                        encode_binary_frame(FRAME_YJS_UPDATE, payload),
+                        frame_kind=FRAME_KIND_YJS,
+                    )
+        elif kind == "permissions":
+            permission_cache.discard(document_id, header["user_id"])
+            if document_id in self.registry:
+                await self.refresh_permissions(document_id, header["user_id"])
 
     async def handle_yjs_update(
         self,
@@ -164,43 +740,147 @@ class WebSocketService:
         document_id: str,
         user_id: str,
         message: dict,
-        db: Session,
     ):
         """Handle Y.js document updates with permission check"""
         # Check if user has edit permission
-        user_permission = None
-        for conn_info in self.active_connections.get(document_id, []):
-            if conn_info["websocket"] == websocket and conn_info["user_id"] == user_id:
-                user_permission = conn_info["permission"]
-                break
-
-        if user_permission not in ["edit", "admin"]:
-            await websocket.send_text(
-                json.dumps(
-                    {"type": "error", "message": "No permission to edit this document"}
-                )
-            )
+        connection = self._get_editor(websocket)
+        if connection is None:
             return
 
-        # Save Y.js update to database if needed
-        if "update" in message:
-            document_service = DocumentService(db)
-            # Get user object
-            from app.db.repositories.user_repository import UserRepository
-
-            user_repo = UserRepository(db)
-            user = user_repo.get_by_id(int(user_id))
-
-            if user:
-                document_service.update_document_content(
-                    document_id=document_id,
-                    content=message.get("content", ""),
-                    user=user,
-                    yjs_update=message.get("update"),
+        # Merge into the server-side document, rejecting invalid updates
+        if message.get("update") and document_id in self.rooms:
+            try:
+                update = base64.b64decode(message["update"])
+            except ValueError:
+                update = b""
+            if not update or not self._apply_room_update(document_id, update):
+                self.send_personal_message(
+                    websocket,
+                    document_id,
+                    {"type": "error", "message": "Invalid Y.js update"},
                 )
+                return
+
+        # Buffer Y.js update for the write-behind flush; with a room the
+        # stored content comes from the room, not from the client
+        if message.get("update"):
+            self.persistence.add_update(
+                document_id,
+                int(connection.user_id),
+                message["update"],
+                content=(
+                    message.get("content") if document_id not in self.rooms else None
+                ),
+            )
 
         # Broadcast to other users
-        await self.broadcast_to_document(document_id, message, exclude_user_id=user_id)
+        self.broadcast_frame(
+            document_id,
+            encode_frame(message),
+            exclude_user_id=connection.user_id,
+            yjs_update="update" in message,
+        )
+
+    async def handle_binary_frame(
+        self,
+        websocket: WebSocket,
+        document_id: str,
+        user_id: str,
+        data: bytes,
+    ):
+        """Dispatch a binary frame by its type byte"""
+        try:
+            frame_type, payload = decode_binary_frame(data)
+        except ValueError as e:
+            self.send_personal_message(
+                websocket, document_id, {"type": "error", "message": str(e)}
+            )
+            return
+
+        if frame_type == FRAME_YJS_UPDATE:
+            await self.handle_yjs_binary_update(
+                websocket, document_id, user_id, data, payload
+            )
+        elif frame_type == FRAME_SYNC_STEP1:
+            self.handle_sync_step1(websocket, document_id, payload)
+        elif frame_type == FRAME_SYNC_STEP2:
+            # Updates the client had but the server lacked
+            await self.handle_yjs_binary_update(
+                websocket,
+                document_id,
+                user_id,
+                encode_binary_frame(FRAME_YJS_UPDATE, payload),
+                payload,
+            )
+        else:
+            self.send_personal_message(
+                websocket,
+                document_id,
+                {
+                    "type": "error",
+                    "message": f"Unknown binary frame type: {frame_type}",
+                },
+            )
+
+    async def handle_yjs_binary_update(
+        self,
+        websocket: WebSocket,
+        document_id: str,
+        user_id: str,
+        frame: bytes,
+        update: bytes,
+    ):
+        """Handle a raw Y.js update and relay the frame unchanged"""
+        connection = self._get_editor(websocket)
+        if connection is None:
+            return
+
+        # Merge into the server-side document, rejecting invalid updates
+        if not self._apply_room_update(document_id, update):
+            self.send_personal_message(
+                websocket,
+                document_id,
+                {"type": "error", "message": "Invalid Y.js update"},
+            )
+            return
+
+        # Buffer Y.js update for the write-behind flush
+        self.persistence.add_update(
+            document_id,
+            int(connection.user_id),
+            base64.b64encode(update).decode("ascii"),
+        )
+
+        # Relay the original binary frame to other users
+        self.broadcast_frame(
+            document_id, frame, exclude_user_id=connection.user_id, yjs_update=True
+        )
+
+    def handle_sync_step1(
+        self, websocket: WebSocket, document_id: str, state_vector: bytes
+    ) -> None:
+        """Reply to a client state vector with only the updates it is missing"""
+        room = self.rooms.get(document_id)
+        if room is None:
+            self.send_personal_message(
+                websocket,
+                document_id,
+                {"type": "error", "message": "Server-side Y.js sync is not available"},
+            )
+            return
+
+        try:
+            diff = room.diff(state_vector)
+        except Exception:
+            self.send_personal_message(
+                websocket,
+                document_id,
+                {"type": "error", "message": "Invalid state vector"},
+            )
+            return
+        self.send_frame(
+            websocket, document_id, encode_binary_frame(FRAME_SYNC_STEP2, diff)
+        )
 
     async def handle_cursor_update(
         self,
@@ -209,24 +889,48 @@ class WebSocketService:
         user_id: str,
         message: dict,
     ):
-        """Handle cursor position updates"""
+        """Handle cursor position updates (coalesced per document tick)"""
+        connection = self.registry.get(websocket)
+        if connection is None or connection.spectator:
+            return
+
         # Add user info to message
-        if (
-            document_id in self.document_users
-            and user_id in self.document_users[document_id]
-        ):
-            user_info = self.document_users[document_id][user_id]
-            message.update(
-                {
-                    "user_id": user_id,
-                    "user_name": user_info["user_name"],
-                    "type": "cursor_update",
-                }
-            )
+        cursor = {key: value for key, value in message.items() if key != "type"}
+        cursor.update(
+            {
+                "user_id": connection.user_id,
+                "user_name": connection.user_name,
+            }
+        )
 
-            await self.broadcast_to_document(
-                document_id, message, exclude_user_id=user_id
+        if document_id not in self.presence:
+            self.presence[document_id] = PresenceAggregator(
+                document_id,
+                settings.WS_CURSOR_TICK_MS / 1000,
+                self._flush_cursor_batch,
             )
+        self.presence[document_id].update(connection.user_id, cursor)
+
+    def _flush_cursor_batch(
+        self, document_id: str, cursors: List[Dict[str, Any]]
+    ) -> None:
+        """Broadcast one cursor_batch frame for the whole room.
+
+        The batch includes the sender's own cursor; clients skip their own
+        user_id so the frame can be encoded once for everyone.
+        """
+        self.broadcast_frame(
+            document_id,
+            encode_frame(
+                {
+                    "type": "cursor_batch",
+                    "document_id": document_id,
+                    "cursors": cursors,
+                }
+            ),
+            spectators=False,
+            frame_kind=FRAME_KIND_CURSOR,
+        )
 
     async def handle_content_change(
         self,
@@ -234,53 +938,48 @@ class WebSocketService:
         document_id: str,
         user_id: str,
         content: str,
-        db: Session,
     ):
         """Handle direct content changes"""
         # Check permission
-        user_permission = None
-        for conn_info in self.active_connections.get(document_id, []):
-            if conn_info["websocket"] == websocket and conn_info["user_id"] == user_id:
-                user_permission = conn_info["permission"]
-                break
-
-        if user_permission not in ["edit", "admin"]:
-            await websocket.send_text(
-                json.dumps(
-                    {"type": "error", "message": "No permission to edit this document"}
-                )
-            )
+        connection = self._get_editor(websocket)
+        if connection is None:
             return
 
-        # Update document in database
-        document_service = DocumentService(db)
-        from app.db.repositories.user_repository import UserRepository
+        # Buffer content for the write-behind flush, unless the room's
+        # Y.js document holds the authoritative text
+        if document_id not in self.rooms:
+            self.persistence.set_content(document_id, content)
 
-        user_repo = UserRepository(db)
-        user = user_repo.get_by_id(int(user_id))
-
-        if user:
-            updated_document = document_service.update_document_content(
-                document_id=document_id, content=content, user=user
-            )
-
-            if updated_document:
-                # Broadcast content change to other users
-                await self.broadcast_to_document(
-                    document_id,
-                    {
-                        "type": "content_changed",
-                        "content": content,
-                        "user_id": user_id,
-                        "user_name": user.username,
-                    },
-                    exclude_user_id=user_id,
-                )
+        # Broadcast content change to other users
+        self.broadcast_frame(
+            document_id,
+            encode_frame(
+                {
+                    "type": "content_changed",
+                    "content": content,
+                    "user_id": connection.user_id,
+                    "user_name": connection.user_name,
+                }
+            ),
+            exclude_user_id=connection.user_id,
+        )
 
     def get_document_users(self, document_id: str) -> Dict[str, Dict]:
-        """Get all users in a document"""
-        return self.document_users.get(document_id, {})
+        """Get all users in a document, across all workers"""
+        nodes = self.remote_presence.get(document_id)
+        if not nodes:
+            return self.registry.users(document_id)
+
+        users: Dict[str, Dict] = {}
+        for node in nodes.values():
+            users.update(node["users"])
+        users.update(self.registry.users(document_id))
+        return users
 
     def get_document_connections_count(self, document_id: str) -> int:
-        """Get number of active connections for a document"""
-        return len(self.active_connections.get(document_id, []))
+        """Get number of active connections for a document, across all workers"""
+        remote = sum(
+            node["connections"]
+            for node in self.remote_presence.get(document_id, {}).values()
+        )
+        return self.registry.count(document_id) + remote
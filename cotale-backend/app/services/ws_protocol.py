@@ -0,0 +1,56 @@
+"""
+Binary frame protocol for real-time collaboration
+
+Binary WebSocket frames carry one type byte followed by the raw payload, so
+Y.js updates travel without JSON or base64 wrapping. Control messages (ping,
+cursor, ai_request, ...) stay on JSON text frames.
+"""
+
+import base64
+import json
+from typing import Optional, Tuple, Union
+
+# A serialized message, shared by every recipient of a broadcast
+Frame = Union[str, bytes]
+
+# Frame type bytes
+FRAME_YJS_UPDATE = 0x01
+FRAME_SYNC_STEP1 = 0x02  # payload: state vector of the sender
+FRAME_SYNC_STEP2 = 0x03  # payload: updates missing from the receiver
+
+
+def encode_binary_frame(frame_type: int, payload: bytes) -> bytes:
+    """Build a binary frame from a type byte and payload"""
+    return bytes((frame_type,)) + payload
+
+
+def decode_binary_frame(data: bytes) -> Tuple[int, bytes]:
+    """Split a binary frame into its type byte and payload"""
+    if not data:
+        raise ValueError("Empty binary frame")
+    return data[0], data[1:]
+
+
+def frame_size(frame: Frame) -> int:
+    """Get the number of bytes a frame takes on the wire"""
+    if isinstance(frame, bytes) or frame.isascii():
+        return len(frame)
+    return len(frame.encode("utf-8"))
+
+
+def replace_yjs_update(frame: str, update: bytes) -> str:
+    """Copy a JSON yjs_update frame with another Y.js update"""
+    message = json.loads(frame)
+    message["update"] = base64.b64encode(update).decode("ascii")
+    return json.dumps(message, separators=(",", ":"))
+
+
+def extract_yjs_update(frame: Frame) -> Optional[bytes]:
+    """Get the Y.js update carried by a binary or JSON yjs_update frame"""
+    if isinstance(frame, bytes):
+        return frame[1:] if frame[:1] == bytes((FRAME_YJS_UPDATE,)) else None
+    try:
+        update = json.loads(frame).get("update")
+        return base64.b64decode(update) if update else None
+    except (ValueError, AttributeError):
+        return None